@@ -1,66 +1,241 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, g, make_response, send_from_directory, abort
+from werkzeug.middleware.proxy_fix import ProxyFix
+import hmac
+import math
 import os
+import time
 import base64
 import io
 import sys
 
-def create_app():
+# Placeholder shipped in the README; never a usable secret
+DEFAULT_SECRET_KEY = 'your-secret-key-here'
+
+def create_app(voice_assistant=None):
     app = Flask(__name__)
 
     # Configuration
-    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-here')
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', DEFAULT_SECRET_KEY)
     app.config['UPLOAD_FOLDER'] = 'data/audio_recordings'
 
-    # Import the voice assistant service
-    try:
-        # Add current directory to path for imports
-        import sys
-        current_dir = os.path.dirname(__file__)
-        parent_dir = os.path.dirname(current_dir)
-        sys.path.append(current_dir)
-        sys.path.append(parent_dir)
-
-        from services.voice_assistant_service import VoiceAssistantService
-        voice_assistant = VoiceAssistantService()
-        print("Voice assistant service initialized successfully!")
-
-    except Exception as e:
-        print(f"Could not initialize voice assistant: {e}. Using fallback mode.")
-        # Fallback mock service
-        class MockVoiceAssistant:
-            def process_voice_query(self, audio_base64):
-                return {
-                    'success': True,
-                    'original_zulu': 'Sawubona, ngicela usizo ngezitshalo zami',
-                    'english_translation': 'Hello, I need help with my plants',
-                    'farming_advice_en': 'For plant diseases, ensure proper watering and use organic pesticides.',
-                    'zulu_advice': 'Ngezifo zezitshalo, qiniseka ukuthi unisele kahle futhi usebenzise imithi yokubulala izinambuzane zemvelo.',
-                    'audio_response_url': None
-                }
+    # Admission control: in-flight audio seconds, per-client request rate, degraded-mode threshold
+    app.config['MAX_INFLIGHT_AUDIO_SECONDS'] = float(os.environ.get('MAX_INFLIGHT_AUDIO_SECONDS', 120))
+    app.config['CLIENT_RATE_PER_MINUTE'] = float(os.environ.get('CLIENT_RATE_PER_MINUTE', 10))
+    app.config['CLIENT_BURST'] = float(os.environ.get('CLIENT_BURST', 5))
+    app.config['DEGRADE_LOAD_FACTOR'] = float(os.environ.get('DEGRADE_LOAD_FACTOR', 0.75))
+
+    # Reverse proxies in front of the app (1 for the Heroku router). Only their
+    # X-Forwarded-For entries are trusted; anything earlier is client-supplied.
+    app.config['TRUSTED_PROXY_HOPS'] = int(os.environ.get('TRUSTED_PROXY_HOPS', 1))
+    if app.config['TRUSTED_PROXY_HOPS'] > 0:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXY_HOPS'])
+
+    # End-to-end time budget per request; clients may ask for less via X-Request-Budget-Ms
+    app.config['REQUEST_BUDGET_SECONDS'] = float(os.environ.get('REQUEST_BUDGET_SECONDS', 25))
+
+    # Multi-turn sessions: in-process LRU by default, or a local SQLite file shared by workers
+    app.config['SESSION_TTL_SECONDS'] = float(os.environ.get('SESSION_TTL_SECONDS', 1800))
+    app.config['SESSION_MAX_ENTRIES'] = int(os.environ.get('SESSION_MAX_ENTRIES', 10000))
+    app.config['SESSION_DB_PATH'] = os.environ.get('SESSION_DB_PATH')
+
+    # Opt-in profiling; admin routes are only mounted when ADMIN_TOKEN is set
+    app.config['PROFILING_ENABLED'] = os.environ.get('PROFILING_ENABLED', '').lower() in ('1', 'true', 'yes')
+    app.config['PROFILE_EVERY_N'] = int(os.environ.get('PROFILE_EVERY_N', 100))
+    app.config['ADMIN_TOKEN'] = os.environ.get('ADMIN_TOKEN')
+
+    # Opt-in request log for traffic replay (see replay_traffic.py)
+    app.config['REQUEST_LOG_PATH'] = os.environ.get('REQUEST_LOG_PATH')
+    app.config['REQUEST_LOG_SAMPLE_RATE'] = float(os.environ.get('REQUEST_LOG_SAMPLE_RATE', 1.0))
+    # HMAC key for hashed client ips and session ids in that log
+    app.config['REQUEST_LOG_KEY'] = os.environ.get('REQUEST_LOG_KEY') or app.config['SECRET_KEY']
+
+    # Add current directory to path for imports
+    current_dir = os.path.dirname(__file__)
+    parent_dir = os.path.dirname(current_dir)
+    sys.path.append(current_dir)
+    sys.path.append(parent_dir)
+
+    # Import the voice assistant service, unless the caller supplied one (e.g. replay stand-ins)
+    if voice_assistant is None:
+        try:
+            from services.voice_assistant_service import VoiceAssistantService
+            voice_assistant = VoiceAssistantService()
+            print("Voice assistant service initialized successfully!")
+
+        except Exception as e:
+            print(f"Could not initialize voice assistant: {e}. Using fallback mode.")
+            # Fallback mock service
+            class MockVoiceAssistant:
+                def process_voice_query(self, audio_base64, skip_audio=False, deadline=None, context=None):
+                    return {
+                        'success': True,
+                        'original_zulu': 'Sawubona, ngicela usizo ngezitshalo zami',
+                        'english_translation': 'Hello, I need help with my plants',
+                        'farming_advice_en': 'For plant diseases, ensure proper watering and use organic pesticides.',
+                        'zulu_advice': 'Ngezifo zezitshalo, qiniseka ukuthi unisele kahle futhi usebenzise imithi yokubulala izinambuzane zemvelo.',
+                        'audio_response_url': None
+                    }
 
-        voice_assistant = MockVoiceAssistant()
+            voice_assistant = MockVoiceAssistant()
+
+    from services.admission_control_service import AdmissionControlService
+    from services.deadline import Deadline, WorkerUnavailable, TRANSCRIPTION_POOL, get_deadline_stats
+    from services.session_service import SessionService, MemorySessionBackend, SqliteSessionBackend
+    from services.profiling_service import ProfilingService
+    from services.offline_bundle_service import OfflineBundleService
+    from services.request_recorder_service import RequestRecorderService
+    admission_control = AdmissionControlService(
+        max_inflight_cost=app.config['MAX_INFLIGHT_AUDIO_SECONDS'],
+        client_rate_per_minute=app.config['CLIENT_RATE_PER_MINUTE'],
+        client_burst=app.config['CLIENT_BURST'],
+        degrade_load_factor=app.config['DEGRADE_LOAD_FACTOR'],
+    )
+
+    if app.config['SESSION_DB_PATH']:
+        session_backend = SqliteSessionBackend(app.config['SESSION_DB_PATH'])
+    else:
+        session_backend = MemorySessionBackend(app.config['SESSION_MAX_ENTRIES'])
+    sessions = SessionService(session_backend, ttl_seconds=app.config['SESSION_TTL_SECONDS'])
+
+    profiler = ProfilingService(enabled=app.config['PROFILING_ENABLED'],
+                                sample_every_n=app.config['PROFILE_EVERY_N'])
+
+    @app.before_request
+    def start_profile():
+        g.profile = profiler.start(request.endpoint or 'unknown')
+
+    @app.teardown_request
+    def stop_profile(exc=None):
+        profile = g.pop('profile', None)
+        if profile is not None:
+            profile.stop()
+
+    offline_bundle = OfflineBundleService(farming_service=getattr(voice_assistant, 'farming_service', None))
+
+    def cacheable_page(template):
+        # Pages revalidate on every visit but cost only a 304 when unchanged
+        response = make_response(render_template(template))
+        response.headers['Cache-Control'] = 'no-cache'
+        response.add_etag()
+        return response.make_conditional(request)
+
+    recorder = None
+    if app.config['REQUEST_LOG_PATH'] and app.config['REQUEST_LOG_KEY'] in ('', DEFAULT_SECRET_KEY):
+        # A public HMAC key would let anyone reverse the hashed client IPs
+        print("WARNING: REQUEST_LOG_PATH is set but neither REQUEST_LOG_KEY nor SECRET_KEY is configured; "
+              "request recording is DISABLED. Set REQUEST_LOG_KEY to a random secret to enable it.")
+    elif app.config['REQUEST_LOG_PATH']:
+        recorder = RequestRecorderService(app.config['REQUEST_LOG_PATH'], app.config['REQUEST_LOG_KEY'],
+                                          sample_rate=app.config['REQUEST_LOG_SAMPLE_RATE'])
+
+    @app.before_request
+    def start_recording():
+        g.record_started = time.perf_counter() if recorder and recorder.should_record() else None
+        # Arrival time, so replay reproduces the original request spacing
+        g.record_ts = time.time()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('record_started', None)
+        if started is not None:
+            entry = {
+                'ts': g.pop('record_ts'),
+                'endpoint': request.endpoint,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'latency_ms': round((time.perf_counter() - started) * 1000, 1),
+                'client': recorder.hash(client_id()),
+            }
+            entry.update(g.pop('record_fields', {}))
+            recorder.record(entry)
+        return response
+
+    def client_id():
+        # ProxyFix has already resolved remote_addr from the trusted proxy hops
+        return request.remote_addr or 'unknown'
+
+    def request_deadline(data):
+        # Client-supplied budgets may only shrink the server default
+        budget = app.config['REQUEST_BUDGET_SECONDS']
+        requested = request.headers.get('X-Request-Budget-Ms') or data.get('budget_ms')
+        try:
+            if requested:
+                budget = min(budget, max(0.0, float(requested) / 1000.0))
+        except (TypeError, ValueError):
+            pass
+        return Deadline(budget, profile=g.get('profile'))
+
+    # Conversation context only improves answers; a busy session store must not fail the query
+    def load_session(session_id):
+        try:
+            return sessions.get(session_id)
+        except Exception as e:
+            print(f"Session load failed, answering without context: {e}")
+            return None
+
+    def save_session(session_id, context):
+        try:
+            sessions.save(session_id, context)
+            return True
+        except Exception as e:
+            print(f"Session save failed: {e}")
+            return False
+
+    def rejection_response(decision):
+        return retry_response(decision.reason, decision.status, decision.retry_after)
+
+    def retry_response(reason, status, retry_after):
+        response = jsonify({'error': reason, 'retry_after': retry_after})
+        response.status_code = status
+        response.headers['Retry-After'] = str(math.ceil(retry_after))
+        return response
 
     # Routes
     @app.route('/')
     def index():
-        return render_template('index.html')
+        return cacheable_page('index.html')
 
     @app.route('/voice-recognition')
     def voice_recognition_page():
-        return render_template('voice_recognition.html')
+        return cacheable_page('voice_recognition.html')
 
     @app.route('/weather')
     def weather():
-        return render_template('weather.html')
+        return cacheable_page('weather.html')
 
     @app.route('/plant-scan')
     def plant_scan():
-        return render_template('plant_scan.html')
+        return cacheable_page('plant_scan.html')
 
     @app.route('/voice-assistant')
     def voice_assistant_page():
         return render_template('voice_assistant.html')
 
+    @app.route('/service-worker.js')
+    def service_worker():
+        # Served from the root so its scope covers every page
+        response = send_from_directory(app.static_folder, 'service-worker.js', max_age=0)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    @app.route('/offline/manifest.json')
+    def offline_manifest():
+        response = jsonify(offline_bundle.current_manifest())
+        response.headers['Cache-Control'] = 'no-cache'
+        response.add_etag()
+        return response.make_conditional(request)
+
+    @app.route('/offline/<version>/<path:filename>')
+    def offline_asset(version, filename):
+        version_dir = offline_bundle.version_dir(version)
+        if version_dir is None:
+            abort(404)
+        # Bundle versions are content hashes, so their files never change
+        response = send_from_directory(version_dir, filename, max_age=31536000)
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+        return response
+
     @app.route('/voice-query', methods=['POST'])
     def voice_query():
         try:
@@ -68,10 +243,55 @@ def create_app():
             if not data or 'audio' not in data:
                 return jsonify({'error': 'No audio data provided'}), 400
 
-            # Process the audio data with new voice assistant
+            deadline = request_deadline(data)
+
+            # Shed load before doing any expensive work
             audio_base64 = data['audio']
-            result = voice_assistant.process_voice_query(audio_base64)
+            audio_cost = admission_control.estimate_audio_cost(audio_base64)
+            session_id = request.headers.get('X-Session-Id') or data.get('session_id')
+            if not isinstance(session_id, str):
+                # JSON bodies can carry numbers or objects here; treat them as no session
+                session_id = None
+            if g.get('record_started') is not None:
+                g.record_fields = {
+                    'audio_hash': recorder.hash(audio_base64),
+                    'audio_bytes': len(audio_base64) * 3 // 4,
+                    'audio_seconds': round(audio_cost, 2),
+                    'budget_ms': round(deadline.budget * 1000),
+                    'session': recorder.hash(session_id),
+                }
 
+            # Refuse rather than queue behind transcriptions that are still running
+            if not TRANSCRIPTION_POOL.has_capacity():
+                return retry_response('Server is busy, please try again shortly', 503, 1)
+
+            decision = admission_control.admit(client_id(), audio_cost)
+            if not decision.admitted:
+                return rejection_response(decision)
+
+            # Process the audio data with new voice assistant
+            try:
+                context = load_session(session_id)
+                if decision.degraded:
+                    print("System under load: skipping audio response for this request")
+                result = voice_assistant.process_voice_query(audio_base64, skip_audio=decision.degraded,
+                                                             deadline=deadline, context=context)
+            except WorkerUnavailable:
+                return retry_response('Server is busy, please try again shortly', 503, 1)
+            finally:
+                # Work abandoned at the deadline keeps running, so its cost stays charged until it ends
+                deadline.on_settled(decision.release)
+
+            if context is not None and save_session(session_id, context):
+                result['session'] = context.to_dict()
+            result['degraded'] = decision.degraded
+            if 'record_fields' in g:
+                g.record_fields.update({
+                    'success': result.get('success'),
+                    'degraded': decision.degraded,
+                    'original_zulu': result.get('original_zulu'),
+                    'english_translation': result.get('english_translation'),
+                })
             return jsonify(result)
         except Exception as e:
             import traceback
@@ -83,9 +303,54 @@ def create_app():
     def test_voice():
         return jsonify({
             'message': 'Voice assistant system is active and ready.',
-            'success': True
+            'success': True,
+            'load': admission_control.get_stats(),
+            'deadlines': get_deadline_stats(),
+            'sessions': sessions.get_stats(),
+            'request_log': recorder.get_stats() if recorder else None
         })
 
+    if app.config['ADMIN_TOKEN']:
+        def admin_authorized():
+            token = request.headers.get('X-Admin-Token', '')
+            return hmac.compare_digest(token, app.config['ADMIN_TOKEN'])
+
+        @app.route('/admin/profiling')
+        def admin_profiling():
+            if not admin_authorized():
+                return jsonify({'error': 'Forbidden'}), 403
+            return jsonify({
+                'enabled': profiler.enabled,
+                'sample_every_n': profiler.sample_every_n,
+                'process': profiler.get_process_stats(),
+            })
+
+        @app.route('/admin/profiling/cpu', methods=['GET', 'DELETE'])
+        def admin_profiling_cpu():
+            if not admin_authorized():
+                return jsonify({'error': 'Forbidden'}), 403
+            if request.method == 'DELETE':
+                profiler.reset_cpu_profiles()
+                return jsonify({'success': True})
+            limit = request.args.get('limit', 50, type=int)
+            return jsonify(profiler.get_cpu_profiles(request.args.get('type'), limit))
+
+        @app.route('/admin/profiling/memory', methods=['GET', 'POST', 'DELETE'])
+        def admin_profiling_memory():
+            if not admin_authorized():
+                return jsonify({'error': 'Forbidden'}), 403
+            # POST takes a baseline snapshot, GET diffs against it, DELETE stops tracing
+            if request.method == 'POST':
+                return jsonify(profiler.take_memory_snapshot())
+            if request.method == 'DELETE':
+                profiler.stop_tracemalloc()
+                return jsonify({'success': True})
+            limit = request.args.get('limit', 25, type=int)
+            key_type = request.args.get('group_by', 'traceback')
+            if key_type not in ('traceback', 'lineno', 'filename'):
+                return jsonify({'error': 'group_by must be traceback, lineno or filename'}), 400
+            return jsonify(profiler.diff_memory_snapshot(limit, key_type))
+
     return app
 
 if __name__ == '__main__':
@@ -0,0 +1,157 @@
+import base64
+import binascii
+import math
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+# Rough bytes-per-second for browser recordings whose header carries no duration
+COMPRESSED_BYTES_PER_SECOND = 4000  # ~32 kbps Opus/AAC voice
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `rate` tokens per second"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, tokens=1):
+        """
+        Take tokens from the bucket
+        :return: (allowed, retry_after_seconds)
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True, 0
+            return False, (tokens - self.tokens) / self.rate
+
+
+class AdmissionDecision:
+    """Outcome of an admission check; admitted work must be released when done"""
+
+    def __init__(self, service, admitted, cost=0, status=200, retry_after=0, reason=None, degraded=False):
+        self.service = service
+        self.admitted = admitted
+        self.cost = cost
+        self.status = status
+        self.retry_after = retry_after
+        self.reason = reason
+        self.degraded = degraded
+        self._released = False
+
+    def release(self):
+        if self.admitted and not self._released:
+            self._released = True
+            self.service._release(self.cost)
+
+
+class AdmissionControlService:
+    """Admission control, load shedding and per-client rate limiting for expensive routes"""
+
+    def __init__(self, max_inflight_cost=120, client_rate_per_minute=10, client_burst=5,
+                 degrade_load_factor=0.75, max_tracked_clients=10000):
+        # Costs are estimated seconds of audio; Whisper work scales roughly with duration
+        self.max_inflight_cost = max_inflight_cost
+        self.client_rate = client_rate_per_minute / 60.0
+        self.client_burst = client_burst
+        self.degrade_load_factor = degrade_load_factor
+        self.max_tracked_clients = max_tracked_clients
+
+        self.inflight_cost = 0.0
+        self.inflight_requests = 0
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def estimate_audio_cost(self, audio_base64):
+        """
+        Estimate the audio duration in seconds without decoding the whole payload
+        :param audio_base64: Base64 audio as posted by the client
+        :return: Estimated duration in seconds (at least 1)
+        """
+        total_bytes = len(audio_base64) * 3 // 4
+        try:
+            header = base64.b64decode(audio_base64[:64])
+        except (binascii.Error, ValueError, TypeError):
+            header = b''
+
+        duration = None
+        if header.startswith(b'RIFF') and header[8:12] == b'WAVE':
+            duration = self._wav_duration(header, total_bytes)
+        if duration is None:
+            duration = total_bytes / COMPRESSED_BYTES_PER_SECOND
+
+        return max(1.0, duration)
+
+    def admit(self, client_id, cost=1.0):
+        """
+        Decide whether to accept a request from a client
+        :param client_id: Client identifier (usually the remote IP)
+        :param cost: Estimated work for the request, from estimate_audio_cost
+        :return: AdmissionDecision
+        """
+        bucket = self._bucket_for(client_id)
+        with self.lock:
+            projected = self.inflight_cost + cost
+            # Always let a lone request through, otherwise oversized uploads could never be served
+            if projected > self.max_inflight_cost and self.inflight_requests > 0:
+                retry_after = math.ceil(projected - self.max_inflight_cost)
+                return AdmissionDecision(self, False, status=503, retry_after=max(1, retry_after),
+                                         reason='Server is busy, please try again shortly')
+
+            # Only requests we are about to accept spend the client's quota
+            allowed, retry_after = bucket.consume()
+            if not allowed:
+                return AdmissionDecision(self, False, status=429, retry_after=max(1, math.ceil(retry_after)),
+                                         reason='Too many requests from this client')
+
+            self.inflight_cost = projected
+            self.inflight_requests += 1
+            degraded = projected > self.max_inflight_cost * self.degrade_load_factor
+
+        return AdmissionDecision(self, True, cost=cost, degraded=degraded)
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'inflight_requests': self.inflight_requests,
+                'inflight_cost': round(self.inflight_cost, 2),
+                'max_inflight_cost': self.max_inflight_cost,
+                'tracked_clients': len(self.buckets),
+            }
+
+    def _release(self, cost):
+        with self.lock:
+            self.inflight_cost = max(0.0, self.inflight_cost - cost)
+            self.inflight_requests = max(0, self.inflight_requests - 1)
+
+    def _bucket_for(self, client_id):
+        with self.lock:
+            bucket = self.buckets.get(client_id)
+            if bucket is None:
+                bucket = TokenBucket(self.client_rate, self.client_burst)
+                self.buckets[client_id] = bucket
+                # Bound memory: forget the least recently seen clients
+                while len(self.buckets) > self.max_tracked_clients:
+                    self.buckets.popitem(last=False)
+            else:
+                self.buckets.move_to_end(client_id)
+            return bucket
+
+    def _wav_duration(self, header, total_bytes):
+        """Duration from the fmt chunk's byte rate, assuming the canonical 44-byte header"""
+        if len(header) < 32 or header[12:16] != b'fmt ':
+            return None
+        byte_rate = struct.unpack('<I', header[28:32])[0]
+        if not byte_rate:
+            return None
+        return max(0, total_bytes - 44) / byte_rate
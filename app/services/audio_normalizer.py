@@ -0,0 +1,118 @@
+import io
+import shutil
+import subprocess
+import wave
+from math import gcd
+
+import numpy as np
+from scipy.signal import resample_poly
+
+TARGET_SAMPLE_RATE = 16000
+
+
+class AudioNormalizer:
+    """Converts uploaded audio to canonical 16 kHz mono LINEAR16 before recognition"""
+
+    def __init__(self, target_rate=TARGET_SAMPLE_RATE):
+        self.target_rate = target_rate
+        self.ffmpeg_path = shutil.which('ffmpeg')
+
+    def probe_format(self, content):
+        """Identify the audio container from its magic bytes"""
+        if content.startswith(b'RIFF') and content[8:12] == b'WAVE':
+            return 'wav'
+        if content.startswith(b'\x1a\x45\xdf\xa3'):
+            return 'webm'
+        if content.startswith(b'OggS'):
+            return 'ogg'
+        if content.startswith(b'fLaC'):
+            return 'flac'
+        if content[4:8] == b'ftyp':
+            return 'mp4'
+        if content.startswith(b'ID3') or content[:2] in (b'\xff\xfb', b'\xff\xf3', b'\xff\xf2'):
+            return 'mp3'
+        return 'unknown'
+
+    def normalize(self, content):
+        """
+        Decode audio bytes into 16 kHz mono int16 samples
+        :param content: Raw audio file bytes as uploaded by the client
+        :return: numpy int16 array at the target sample rate
+        """
+        if self.probe_format(content) == 'wav':
+            try:
+                samples, sample_rate = self._decode_wav(content)
+                return self._to_int16(self._resample(samples, sample_rate))
+            except (wave.Error, ValueError):
+                # Compressed or extensible WAV variants are left to FFmpeg
+                pass
+
+        return self._decode_with_ffmpeg(content)
+
+    def to_linear16(self, samples):
+        """Serialize int16 samples as little-endian LINEAR16 bytes"""
+        return samples.astype('<i2', copy=False).tobytes()
+
+    def to_float32(self, samples):
+        """Scale int16 samples to the [-1, 1] float32 range Whisper expects"""
+        return samples.astype(np.float32) / 32768.0
+
+    def duration_seconds(self, samples):
+        """Duration of normalized samples in seconds"""
+        return len(samples) / float(self.target_rate)
+
+    def _decode_wav(self, content):
+        """Decode PCM WAV into a mono float32 array without shelling out"""
+        with wave.open(io.BytesIO(content), 'rb') as wav_file:
+            channels = wav_file.getnchannels()
+            sample_width = wav_file.getsampwidth()
+            sample_rate = wav_file.getframerate()
+            frames = wav_file.readframes(wav_file.getnframes())
+
+        if sample_width == 1:
+            samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+        elif sample_width == 2:
+            samples = np.frombuffer(frames, dtype='<i2').astype(np.float32) / 32768.0
+        elif sample_width == 3:
+            raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+            packed = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+            packed = np.where(packed & 0x800000, packed - 0x1000000, packed)
+            samples = packed.astype(np.float32) / 8388608.0
+        elif sample_width == 4:
+            samples = np.frombuffer(frames, dtype='<i4').astype(np.float32) / 2147483648.0
+        else:
+            raise ValueError(f"Unsupported WAV sample width: {sample_width}")
+
+        if channels > 1:
+            samples = samples[:len(samples) - len(samples) % channels]
+            samples = samples.reshape(-1, channels).mean(axis=1)
+
+        return samples, sample_rate
+
+    def _resample(self, samples, sample_rate):
+        """Polyphase resample float samples to the target rate"""
+        if sample_rate == self.target_rate or len(samples) == 0:
+            return samples
+        divisor = gcd(self.target_rate, sample_rate)
+        return resample_poly(samples, self.target_rate // divisor, sample_rate // divisor)
+
+    def _to_int16(self, samples):
+        return (np.clip(samples, -1.0, 1.0) * 32767.0).astype(np.int16)
+
+    def _decode_with_ffmpeg(self, content):
+        """Decode any container FFmpeg understands straight to 16 kHz mono s16le"""
+        if not self.ffmpeg_path:
+            raise RuntimeError("FFmpeg not found; cannot normalize compressed audio")
+
+        command = [
+            self.ffmpeg_path, '-nostdin', '-loglevel', 'error',
+            '-i', 'pipe:0',
+            '-f', 's16le', '-acodec', 'pcm_s16le',
+            '-ac', '1', '-ar', str(self.target_rate),
+            'pipe:1',
+        ]
+        process = subprocess.run(command, input=content, capture_output=True)
+        if process.returncode != 0:
+            raise RuntimeError(f"FFmpeg failed to decode audio: {process.stderr.decode(errors='ignore').strip()}")
+
+        return np.frombuffer(process.stdout, dtype='<i2').copy()
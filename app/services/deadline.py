@@ -0,0 +1,208 @@
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+DEFAULT_BUDGET_SECONDS = 25.0  # Stay under the 30 s Heroku router timeout
+
+# Remaining budget each stage needs before we attempt the real call instead of its fallback
+STAGE_MIN_SECONDS = {
+    'transcription': 3.0,
+    'translation': 1.0,
+    'back_translation': 1.0,
+    'tts': 2.0,
+    'upload': 1.0,
+    'recognize': 2.0,
+}
+
+_stats_lock = threading.Lock()
+_misses = Counter()      # Stage ran out of time mid-call
+_fallbacks = Counter()   # Stage skipped up front because the budget was too small
+_saturated = Counter()   # Stage refused because every worker in its pool was busy
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a pipeline stage does not finish within the request deadline"""
+
+    def __init__(self, stage):
+        super().__init__(f"Deadline exceeded during {stage}")
+        self.stage = stage
+
+
+class WorkerUnavailable(Exception):
+    """Raised when a stage's worker pool has no free thread; callers should shed the request"""
+
+    def __init__(self, stage):
+        super().__init__(f"No free worker for {stage}")
+        self.stage = stage
+
+
+class WorkerPool:
+    """Bounded thread pool that refuses work instead of queueing it
+
+    A slot is held until the job really finishes, so calls abandoned by a
+    timed-out request keep counting against capacity while they still burn CPU.
+    """
+
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(size)
+        self._busy = 0
+        self._busy_lock = threading.Lock()
+
+    def has_capacity(self):
+        return self.busy() < self.size
+
+    def busy(self):
+        with self._busy_lock:
+            return self._busy
+
+    def submit(self, func, *args, **kwargs):
+        """Run func on a free worker; returns None if every worker is busy"""
+        if not self._slots.acquire(blocking=False):
+            return None
+        with self._busy_lock:
+            self._busy += 1
+
+        def task():
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self._busy_lock:
+                    self._busy -= 1
+                self._slots.release()
+
+        return self._executor.submit(task)
+
+
+# Whisper is CPU-bound and gets its own small pool so stuck transcriptions
+# cannot starve the network calls (googletrans) or be blamed on them
+TRANSCRIPTION_POOL = WorkerPool('transcription', int(os.environ.get('TRANSCRIPTION_WORKERS', 2)))
+NETWORK_POOL = WorkerPool('network', int(os.environ.get('NETWORK_WORKERS', 8)))
+STAGE_POOLS = {'transcription': TRANSCRIPTION_POOL}
+
+
+class Deadline:
+    """Request-scoped time budget passed through every pipeline stage
+
+    profile is the request's SamplingProfile, if it is being profiled; worker
+    threads register with it while they run this request's stages.
+    """
+
+    def __init__(self, budget_seconds=DEFAULT_BUDGET_SECONDS, profile=None):
+        self.budget = budget_seconds
+        self.profile = profile
+        self.expires_at = time.monotonic() + budget_seconds
+        self._lock = threading.Lock()
+        self._abandoned = set()
+        self._settled_callbacks = []
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def allows(self, stage):
+        """True if enough budget is left to attempt the stage; otherwise record a fallback"""
+        if self.remaining() >= STAGE_MIN_SECONDS.get(stage, 0.0):
+            return True
+        record_fallback(stage)
+        print(f"Deadline: only {self.remaining():.2f}s left, using fallback for {stage}")
+        return False
+
+    def timeout(self, cap=None):
+        """Seconds to pass as a per-call timeout, optionally capped"""
+        remaining = self.remaining()
+        return remaining if cap is None else min(remaining, cap)
+
+    def run(self, stage, func, *args, pool=None, **kwargs):
+        """
+        Run a blocking call on the stage's worker pool, giving up once the deadline passes
+        The worker thread is not interrupted; only the request stops waiting for it.
+        Abandoned work is tracked so on_settled() can wait for it.
+        """
+        if self.expired():
+            record_miss(stage)
+            raise DeadlineExceeded(stage)
+
+        if self.profile is not None:
+            func = self._profiled(func)
+
+        pool = pool or STAGE_POOLS.get(stage, NETWORK_POOL)
+        future = pool.submit(func, *args, **kwargs)
+        if future is None:
+            record_saturated(stage)
+            raise WorkerUnavailable(stage)
+
+        try:
+            return future.result(timeout=self.remaining())
+        except FutureTimeoutError:
+            record_miss(stage)
+            print(f"Deadline: {stage} did not finish within budget")
+            self._abandon(future)
+            raise DeadlineExceeded(stage)
+
+    def on_settled(self, callback):
+        """Call back once every call this request abandoned has actually finished"""
+        with self._lock:
+            if self._abandoned:
+                self._settled_callbacks.append(callback)
+                return
+        callback()
+
+    def _profiled(self, func):
+        profile = self.profile
+
+        def profiled(*args, **kwargs):
+            thread_id = threading.get_ident()
+            profile.add_thread(thread_id)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile.remove_thread(thread_id)
+
+        return profiled
+
+    def _abandon(self, future):
+        with self._lock:
+            self._abandoned.add(future)
+        future.add_done_callback(self._abandoned_done)
+
+    def _abandoned_done(self, future):
+        with self._lock:
+            self._abandoned.discard(future)
+            if self._abandoned:
+                return
+            callbacks, self._settled_callbacks = self._settled_callbacks, []
+        for callback in callbacks:
+            callback()
+
+
+def record_miss(stage):
+    with _stats_lock:
+        _misses[stage] += 1
+
+
+def record_fallback(stage):
+    with _stats_lock:
+        _fallbacks[stage] += 1
+
+
+def record_saturated(stage):
+    with _stats_lock:
+        _saturated[stage] += 1
+
+
+def get_deadline_stats():
+    """Per-stage counts of hard misses, budget-driven fallbacks and pool saturation"""
+    with _stats_lock:
+        return {
+            'misses': dict(_misses),
+            'fallbacks': dict(_fallbacks),
+            'saturated': dict(_saturated),
+            'busy_workers': {pool.name: pool.busy() for pool in (TRANSCRIPTION_POOL, NETWORK_POOL)},
+        }
@@ -0,0 +1,324 @@
+"""
+Compiled, memory-mapped farming knowledge base
+
+The editable source is data/knowledge_base.json. It is compiled into a compact
+binary file that every worker memory-maps read-only, so the pages are shared
+through the OS page cache instead of being copied into each worker's heap.
+Nothing is decoded up front: lookups probe the hash table in the mapped file.
+
+File layout (little-endian):
+    header   magic b'AGKB', format version (H), reserved (H), entry count (I),
+             records offset (I), data version (I), hash table offset (I),
+             hash table slots (I), lengths offset (I), lengths count (I)
+    strings  UTF-8 keyword, category, English, Zulu, region and season text
+    records  one per entry, in match-priority order: (offset, length) pairs
+             for keyword, category, en, zu, region and season
+    table    open-addressing hash table of (crc32 of keyword, entry index + 1)
+             slots, probed linearly; 0 marks an empty slot
+    lengths  distinct keyword lengths in bytes, ascending
+
+Entries may be tagged with a region and/or season. A tagged entry only matches
+callers asking for that region/season, and wins over the untagged entry for
+the same keyword.
+
+Rebuild with:
+    python app/services/knowledge_base.py [source.json] [output.kb]
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zlib
+
+MAGIC = b'AGKB'
+FORMAT_VERSION = 2
+HEADER = struct.Struct('<4sHHIIIIIII')
+RECORD = struct.Struct('<12I')
+SLOT = struct.Struct('<II')
+LENGTH = struct.Struct('<I')
+FIELDS = ('keyword', 'category', 'en', 'zu', 'region', 'season')
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+DEFAULT_SOURCE_PATH = os.path.join(PROJECT_ROOT, 'data', 'knowledge_base.json')
+DEFAULT_KB_PATH = os.path.join(PROJECT_ROOT, 'data', 'knowledge_base.kb')
+
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def compile_knowledge_base(source_path=DEFAULT_SOURCE_PATH, output_path=DEFAULT_KB_PATH):
+    """
+    Compile the JSON knowledge base into the binary format
+    The output is written to a temp file and swapped in with os.replace, so
+    running workers pick up either the old or the new file, never a partial one.
+    :return: Number of entries written
+    """
+    with open(source_path, 'r', encoding='utf-8') as f:
+        source = json.load(f)
+
+    # Later duplicates override the text but keep the first keyword's position,
+    # matching the dict-literal semantics the service was built on
+    entries = {}
+    for entry in source['entries']:
+        keyword = entry['keyword'].lower()
+        region = entry.get('region', '').lower()
+        season = entry.get('season', '').lower()
+        entries[(keyword, region, season)] = {
+            'keyword': keyword,
+            'category': entry.get('category', ''),
+            'en': entry['en'],
+            'zu': entry.get('zu', ''),
+            'region': region,
+            'season': season,
+        }
+
+    # Keep each keyword's variants together at its first position, most specific
+    # first, so "lowest matching index wins" also picks the best variant
+    first_seen = {}
+    for position, (keyword, _, _) in enumerate(entries):
+        first_seen.setdefault(keyword, position)
+    ordered = sorted(entries.values(), key=lambda entry: (
+        first_seen[entry['keyword']], -(bool(entry['region']) + bool(entry['season']))))
+
+    strings = bytearray()
+    string_offsets = {}
+    records = []
+    data_start = HEADER.size
+
+    for entry in ordered:
+        record = []
+        for field in FIELDS:
+            encoded = entry[field].encode('utf-8')
+            # Categories and untranslated blanks repeat a lot; store each string once
+            if encoded not in string_offsets:
+                string_offsets[encoded] = data_start + len(strings)
+                strings.extend(encoded)
+            record.extend((string_offsets[encoded], len(encoded)))
+        records.append(record)
+
+    # Power-of-two table at most half full keeps probe chains short
+    slots = 8
+    while slots < len(records) * 2:
+        slots *= 2
+    table = [(0, 0)] * slots
+    for index, entry in enumerate(ordered):
+        keyword_hash = zlib.crc32(entry['keyword'].encode('utf-8'))
+        slot = keyword_hash & (slots - 1)
+        while table[slot][1]:
+            slot = (slot + 1) & (slots - 1)
+        table[slot] = (keyword_hash, index + 1)
+
+    lengths = sorted({len(entry['keyword'].encode('utf-8')) for entry in ordered})
+
+    records_offset = data_start + len(strings)
+    table_offset = records_offset + len(records) * RECORD.size
+    lengths_offset = table_offset + slots * SLOT.size
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(records), records_offset,
+                         int(source.get('version', 0)), table_offset, slots, lengths_offset, len(lengths))
+
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(output_dir, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=output_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header)
+            f.write(strings)
+            for record in records:
+                f.write(RECORD.pack(*record))
+            for slot in table:
+                f.write(SLOT.pack(*slot))
+            for length in lengths:
+                f.write(LENGTH.pack(length))
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, output_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+    print(f"Compiled {len(records)} knowledge base entries to {output_path}")
+    return len(records)
+
+
+class KnowledgeEntry:
+    """Handle to one entry, pinned to the file version it was found in
+
+    Fields are read from that version's mapping even if the knowledge base is
+    reloaded in between, so a match and its text always come from one file.
+    """
+
+    __slots__ = ('_state', 'index')
+
+    def __init__(self, state, index):
+        self._state = state
+        self.index = index
+
+    def __getitem__(self, field):
+        state = self._state
+        record = RECORD.unpack_from(state['data'], state['records_offset'] + self.index * RECORD.size)
+        position = FIELDS.index(field) * 2
+        offset, length = record[position], record[position + 1]
+        return state['data'][offset:offset + length].decode('utf-8')
+
+    def __repr__(self):
+        return f"KnowledgeEntry({self['keyword']!r}, index={self.index})"
+
+
+class KnowledgeBase:
+    """Read-only view over a compiled knowledge base file"""
+
+    def __init__(self, path=DEFAULT_KB_PATH, reload_interval=5.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._last_check = time.monotonic()
+        self._state = self._open()
+
+    def __len__(self):
+        return self._state['count']
+
+    @property
+    def data_version(self):
+        return self._state['data_version']
+
+    def entries(self):
+        """Iterate every entry of one file version, in match-priority order"""
+        state = self._state
+        for index in range(state['count']):
+            yield KnowledgeEntry(state, index)
+
+    def match(self, query, region=None, season=None):
+        """
+        Find the highest-priority entry whose keyword is contained in the query
+        Every substring of the query with a known keyword length is looked up in
+        the hash table, so the cost depends on the query, not the entry count.
+        :param region: Caller's region; entries tagged with another region are skipped
+        :param season: Caller's season; entries tagged with another season are skipped
+        :return: KnowledgeEntry, or None if nothing matches
+        """
+        self.reload_if_changed()
+        state = self._state
+        encoded = query.lower().encode('utf-8')
+        best = None
+        for length in state['lengths']:
+            for start in range(len(encoded) - length + 1):
+                for index in self._lookup(state, encoded[start:start + length]):
+                    if best is not None and index >= best:
+                        break
+                    entry = KnowledgeEntry(state, index)
+                    if self._eligible(entry, region, season):
+                        best = index
+                        break
+        return KnowledgeEntry(state, best) if best is not None else None
+
+    def get(self, keyword, default=None, field='en', region=None, season=None):
+        state = self._state
+        for index in self._lookup(state, keyword.lower().encode('utf-8')):
+            entry = KnowledgeEntry(state, index)
+            if self._eligible(entry, region, season):
+                return entry[field]
+        return default
+
+    def reload_if_changed(self):
+        """Swap in a rebuilt file without a restart; checks at most every reload_interval seconds"""
+        now = time.monotonic()
+        if now - self._last_check < self.reload_interval:
+            return False
+        self._last_check = now
+
+        try:
+            if self._file_identity() == self._state['identity']:
+                return False
+            new_state = self._open()
+        except (OSError, ValueError) as e:
+            print(f"Knowledge base reload failed, keeping current version: {e}")
+            return False
+
+        # Entry handles from the old state keep a valid mapping until they are dropped
+        self._state = new_state
+        print(f"Knowledge base reloaded: {new_state['count']} entries (version {new_state['data_version']})")
+        return True
+
+    def _lookup(self, state, keyword):
+        """Entry indexes whose keyword equals the given bytes, in ascending order"""
+        data = state['data']
+        mask = state['table_slots'] - 1
+        keyword_hash = zlib.crc32(keyword)
+        slot = keyword_hash & mask
+        indexes = []
+        while True:
+            slot_hash, stored = SLOT.unpack_from(data, state['table_offset'] + slot * SLOT.size)
+            if not stored:
+                break
+            if slot_hash == keyword_hash:
+                index = stored - 1
+                offset, length = RECORD.unpack_from(data, state['records_offset'] + index * RECORD.size)[:2]
+                if data[offset:offset + length] == keyword:
+                    indexes.append(index)
+            slot = (slot + 1) & mask
+        return sorted(indexes)
+
+    def _eligible(self, entry, region, season):
+        entry_region, entry_season = entry['region'], entry['season']
+        return (not entry_region or entry_region == (region or '').lower()) and \
+            (not entry_season or entry_season == (season or '').lower())
+
+    def _file_identity(self):
+        stat = os.stat(self.path)
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _open(self):
+        with open(self.path, 'rb') as f:
+            identity = os.fstat(f.fileno())
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, _, count, records_offset, data_version,
+         table_offset, table_slots, lengths_offset, lengths_count) = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{self.path} is not a version {FORMAT_VERSION} knowledge base")
+
+        return {
+            'data': data,
+            'count': count,
+            'records_offset': records_offset,
+            'data_version': data_version,
+            'table_offset': table_offset,
+            'table_slots': table_slots,
+            'lengths': [LENGTH.unpack_from(data, lengths_offset + i * LENGTH.size)[0] for i in range(lengths_count)],
+            'identity': (identity.st_ino, identity.st_mtime_ns, identity.st_size),
+        }
+
+
+def load_knowledge_base(path=DEFAULT_KB_PATH, source_path=DEFAULT_SOURCE_PATH):
+    """
+    Return the shared KnowledgeBase for a path, compiling it first if missing, stale or in an old format
+    """
+    with _loaded_lock:
+        if path in _loaded:
+            return _loaded[path]
+
+        if os.path.exists(source_path) and (
+                not os.path.exists(path) or os.path.getmtime(source_path) > os.path.getmtime(path)
+                or not _is_current_format(path)):
+            compile_knowledge_base(source_path, path)
+
+        knowledge_base = KnowledgeBase(path)
+        _loaded[path] = knowledge_base
+        return knowledge_base
+
+
+def _is_current_format(path):
+    with open(path, 'rb') as f:
+        header = f.read(8)
+    return len(header) == 8 and struct.unpack('<4sH', header[:6]) == (MAGIC, FORMAT_VERSION)
+
+
+if __name__ == '__main__':
+    source = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_SOURCE_PATH
+    output = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_KB_PATH
+    compile_knowledge_base(source, output)
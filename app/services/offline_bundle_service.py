@@ -0,0 +1,202 @@
+"""
+Versioned offline bundle for the web client
+
+A bundle is the knowledge base exported as JSON (English and Zulu advice),
+a small Zulu phrase table for on-device matching, and pre-rendered Zulu TTS
+clips. Every file lives under data/offline_bundle/<version>/, where the version
+is a content hash, so the app can serve bundle files as immutable.
+
+Build a full bundle (needs network for translation and gTTS) from app/ with:
+    python -m services.offline_bundle_service
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+from .farming_advice_service import FarmingAdviceService
+from .knowledge_base import PROJECT_ROOT
+
+DEFAULT_BUNDLE_ROOT = os.path.join(PROJECT_ROOT, 'data', 'offline_bundle')
+CURRENT_POINTER = 'current.json'
+KNOWLEDGE_FILE = 'knowledge.json'
+
+# Zulu phrases offered as quick questions in the UI. 'en' is the translation shown
+# to the user; 'keyword' is the knowledge base entry the phrase answers with
+# (None falls through to the default advice)
+OFFLINE_PHRASES = {
+    'sawubona': {'en': 'Hello', 'keyword': None},
+    'ngicela usizo': {'en': 'I need help', 'keyword': None},
+    'izitshalo zami zinezifo': {'en': 'My plants have diseases', 'keyword': 'disease'},
+    'isimo sezulu sithini': {'en': "What's the weather like?", 'keyword': 'weather'},
+    'ngidinga umanyolo': {'en': 'I need fertilizer', 'keyword': 'fertilizer'},
+    'ngidinga ukunisela': {'en': 'I need to water', 'keyword': 'water'},
+    'utamatisi': {'en': 'Tomatoes', 'keyword': 'tomato'},
+    'isitshalo': {'en': 'Plant', 'keyword': 'plant'},
+    'nambuzane': {'en': 'Pests', 'keyword': 'pest'},
+}
+
+DEFAULT_ADVICE_ZU = "Iseluleko sokulima: Sebenzisa izindlela ezisimeme, hlola izitshalo zakho njalo, gcina inhlabathi."
+
+
+class OfflineBundleService:
+    """Builds and serves content-addressed offline bundles"""
+
+    def __init__(self, bundle_root=DEFAULT_BUNDLE_ROOT, farming_service=None):
+        self.bundle_root = bundle_root
+        self.farming_service = farming_service or FarmingAdviceService()
+        self.lock = threading.Lock()
+        self._manifest = None
+        self._manifest_mtime = None
+
+    def build(self, translate=True, render_audio=True):
+        """
+        Export the knowledge base into a new bundle version and make it current
+        :param translate: Fill in missing Zulu text with googletrans
+        :param render_audio: Pre-render a gTTS clip for every Zulu answer
+        :return: The new manifest
+        """
+        knowledge_base = self.farming_service.knowledge_base
+        translator = self._load_translator() if translate else None
+
+        entries = []
+        for entry in knowledge_base.entries():
+            # The device has no region or season context, so only untagged entries are exported
+            if entry['region'] or entry['season']:
+                continue
+            keyword = entry['keyword']
+            english = entry['en']
+            zulu = entry['zu']
+            if not zulu and translator is not None:
+                try:
+                    zulu = translator.translate(english, src='en', dest='zu').text
+                except Exception as e:
+                    print(f"Offline bundle: translation failed for '{keyword}': {e}")
+            entries.append({
+                'keyword': keyword,
+                'category': entry['category'],
+                'en': english,
+                'zu': zulu,
+            })
+
+        exported = {entry['keyword'] for entry in entries}
+        for phrase, target in OFFLINE_PHRASES.items():
+            if target['keyword'] and target['keyword'] not in exported:
+                print(f"Offline bundle: phrase '{phrase}' points at missing keyword '{target['keyword']}'")
+
+        default_en = self.farming_service.get_advice('')
+        knowledge = {
+            'kb_version': knowledge_base.data_version,
+            'entries': entries,
+            'phrases': OFFLINE_PHRASES,
+            'default': {'en': default_en, 'zu': DEFAULT_ADVICE_ZU},
+        }
+
+        os.makedirs(self.bundle_root, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=self.bundle_root, prefix='.build-')
+        try:
+            assets = []
+            if render_audio:
+                os.makedirs(os.path.join(staging, 'audio'))
+                for item in entries + [knowledge['default']]:
+                    clip = self._render_clip(item['zu'], staging)
+                    if clip:
+                        item['audio'] = clip
+                        if clip not in assets:
+                            assets.append(clip)
+
+            payload = json.dumps(knowledge, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+            with open(os.path.join(staging, KNOWLEDGE_FILE), 'wb') as f:
+                f.write(payload)
+            assets.insert(0, KNOWLEDGE_FILE)
+
+            # Content-addressed version: any change to text or clips yields a new URL space
+            digest = hashlib.sha256(payload)
+            for clip in assets[1:]:
+                digest.update(clip.encode('utf-8'))
+            version = digest.hexdigest()[:16]
+
+            version_dir = os.path.join(self.bundle_root, version)
+            if os.path.exists(version_dir):
+                shutil.rmtree(staging)
+            else:
+                os.chmod(staging, 0o755)
+                try:
+                    os.rename(staging, version_dir)
+                except OSError:
+                    # Another worker process published the same version first; same hash, same content
+                    if not os.path.isdir(version_dir):
+                        raise
+                    shutil.rmtree(staging)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        manifest = {
+            'version': version,
+            'base_url': f'/offline/{version}/',
+            'assets': assets,
+            'entries': len(entries),
+        }
+        self._write_pointer(manifest)
+        print(f"Offline bundle {version} built: {len(entries)} entries, {len(assets) - 1} audio clips")
+        return manifest
+
+    def current_manifest(self):
+        """Manifest of the current bundle, building a text-only one if none exists yet"""
+        with self.lock:
+            pointer = os.path.join(self.bundle_root, CURRENT_POINTER)
+            if self._manifest is None or self._pointer_changed(pointer):
+                if not os.path.exists(pointer):
+                    self.build(translate=False, render_audio=False)
+                with open(pointer, 'r', encoding='utf-8') as f:
+                    self._manifest = json.load(f)
+                self._manifest_mtime = os.path.getmtime(pointer)
+            return self._manifest
+
+    def version_dir(self, version):
+        """Directory for a bundle version, or None for anything that is not a built version"""
+        if not version.isalnum():
+            return None
+        path = os.path.join(self.bundle_root, version)
+        return path if os.path.isdir(path) else None
+
+    def _pointer_changed(self, pointer):
+        return not os.path.exists(pointer) or os.path.getmtime(pointer) != self._manifest_mtime
+
+    def _write_pointer(self, manifest):
+        fd, temp_path = tempfile.mkstemp(dir=self.bundle_root, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, os.path.join(self.bundle_root, CURRENT_POINTER))
+
+    def _render_clip(self, zulu_text, staging):
+        """Render one Zulu clip with gTTS; identical text shares a clip"""
+        if not zulu_text:
+            return None
+        name = f"audio/{hashlib.sha1(zulu_text.encode('utf-8')).hexdigest()[:16]}.mp3"
+        path = os.path.join(staging, name)
+        if os.path.exists(path):
+            return name
+        try:
+            from gtts import gTTS
+            gTTS(zulu_text, lang='zu', slow=False).save(path)
+            return name
+        except Exception as e:
+            print(f"Offline bundle: audio rendering failed: {e}")
+            return None
+
+    def _load_translator(self):
+        try:
+            from googletrans import Translator
+            return Translator()
+        except Exception as e:
+            print(f"Offline bundle: translator unavailable ({e}); missing Zulu text stays empty")
+            return None
+
+
+if __name__ == '__main__':
+    OfflineBundleService().build()
@@ -0,0 +1,202 @@
+import gc
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+
+class SamplingProfile:
+    """Samples the request thread, and pipeline workers while they run its work, until stopped"""
+
+    def __init__(self, service, request_type, interval):
+        self.service = service
+        self.request_type = request_type
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.thread_ids = {self.thread_id}
+        self.stacks = Counter()
+        self.samples = 0
+        self.started = time.perf_counter()
+        self._threads_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name='profiler-sampler', daemon=True)
+        self._sampler.start()
+
+    def add_thread(self, thread_id):
+        """Attribute a worker thread's samples to this request while it works for it (see Deadline.run)"""
+        with self._threads_lock:
+            self.thread_ids.add(thread_id)
+
+    def remove_thread(self, thread_id):
+        with self._threads_lock:
+            self.thread_ids.discard(thread_id)
+
+    def stop(self):
+        self._stop.set()
+        self._sampler.join()
+        self.service._record(self.request_type, self.stacks, self.samples, time.perf_counter() - self.started)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self._threads_lock:
+                thread_ids = list(self.thread_ids)
+
+            frames = sys._current_frames()
+            for thread_id in thread_ids:
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = self._collapse(frame)
+                # A pool worker between jobs waits inside ThreadPoolExecutor's _worker loop
+                if thread_id != self.thread_id and stack.endswith('thread.py:_worker'):
+                    continue
+                self.stacks[stack] += 1
+            self.samples += 1
+
+    def _collapse(self, frame):
+        """Flame-graph style 'file:function;file:function' stack, outermost first"""
+        parts = []
+        while frame is not None:
+            parts.append(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}")
+            frame = frame.f_back
+        return ';'.join(reversed(parts))
+
+
+class ProfilingService:
+    """Opt-in production profiling: sampled CPU stacks, tracemalloc diffs and process/torch stats"""
+
+    def __init__(self, enabled=False, sample_every_n=100, sample_interval=0.005,
+                 tracemalloc_frames=10, max_stacks_per_type=500):
+        self.enabled = enabled
+        self.sample_every_n = max(1, sample_every_n)
+        self.sample_interval = sample_interval
+        self.tracemalloc_frames = tracemalloc_frames
+        self.max_stacks_per_type = max_stacks_per_type
+
+        self.request_counts = Counter()
+        self.profiles = defaultdict(Counter)
+        self.profile_totals = defaultdict(lambda: {'profiled_requests': 0, 'samples': 0, 'seconds': 0.0})
+        self.baseline_snapshot = None
+        self.lock = threading.Lock()
+
+    def start(self, request_type):
+        """
+        Begin profiling this request if it is the Nth of its type
+        :return: SamplingProfile to stop when the request ends, or None
+        """
+        if not self.enabled:
+            return None
+        with self.lock:
+            self.request_counts[request_type] += 1
+            if self.request_counts[request_type] % self.sample_every_n:
+                return None
+        return SamplingProfile(self, request_type, self.sample_interval)
+
+    def get_cpu_profiles(self, request_type=None, limit=50):
+        """Top collapsed stacks per request type, hottest first"""
+        with self.lock:
+            request_types = [request_type] if request_type else list(self.profiles)
+            return {
+                name: {
+                    **self.profile_totals[name],
+                    'stacks': [{'stack': stack, 'samples': count}
+                               for stack, count in self.profiles[name].most_common(limit)],
+                }
+                for name in request_types if name in self.profiles
+            }
+
+    def reset_cpu_profiles(self):
+        with self.lock:
+            self.profiles.clear()
+            self.profile_totals.clear()
+
+    def take_memory_snapshot(self):
+        """Start tracing if needed and store a baseline snapshot for later diffs"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.tracemalloc_frames)
+        self.baseline_snapshot = tracemalloc.take_snapshot()
+        traced, peak = tracemalloc.get_traced_memory()
+        return {'tracing': True, 'traced_bytes': traced, 'peak_bytes': peak}
+
+    def diff_memory_snapshot(self, limit=25, key_type='traceback'):
+        """Allocation growth since the baseline snapshot, largest first"""
+        if not tracemalloc.is_tracing() or self.baseline_snapshot is None:
+            return {'error': 'No baseline snapshot; take one first'}
+
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ])
+        stats = snapshot.compare_to(self.baseline_snapshot, key_type)
+        return {
+            'top': [{
+                'size_diff_bytes': stat.size_diff,
+                'size_bytes': stat.size,
+                'count_diff': stat.count_diff,
+                'traceback': stat.traceback.format()[-self.tracemalloc_frames:],
+            } for stat in stats[:limit]],
+        }
+
+    def stop_tracemalloc(self):
+        tracemalloc.stop()
+        self.baseline_snapshot = None
+
+    def get_process_stats(self):
+        """RSS, open file descriptors, GC and torch allocator/thread state"""
+        stats = {
+            'pid': os.getpid(),
+            'threads': threading.active_count(),
+            'gc_counts': gc.get_count(),
+            'gc_objects': len(gc.get_objects()),
+            'tracemalloc': tracemalloc.is_tracing(),
+            'request_counts': dict(self.request_counts),
+        }
+
+        # Peak RSS via getrusage; the resource module is Unix-only
+        try:
+            import resource
+            stats['max_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        except ImportError:
+            pass
+
+        # Current RSS and fd count come from /proc where available (Linux/Heroku)
+        try:
+            with open('/proc/self/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        stats['rss_kb'] = int(line.split()[1])
+            stats['open_fds'] = len(os.listdir('/proc/self/fd'))
+        except OSError:
+            pass
+
+        stats['torch'] = self._torch_stats()
+        return stats
+
+    def _torch_stats(self):
+        # Only report on torch if Whisper already imported it; never import it here
+        torch = sys.modules.get('torch')
+        if torch is None:
+            return None
+        stats = {
+            'num_threads': torch.get_num_threads(),
+            'num_interop_threads': torch.get_num_interop_threads(),
+            'cuda_available': torch.cuda.is_available(),
+        }
+        if stats['cuda_available']:
+            stats['cuda_memory_allocated'] = torch.cuda.memory_allocated()
+            stats['cuda_memory_reserved'] = torch.cuda.memory_reserved()
+            stats['cuda_max_memory_allocated'] = torch.cuda.max_memory_allocated()
+        return stats
+
+    def _record(self, request_type, stacks, samples, seconds):
+        with self.lock:
+            profile = self.profiles[request_type]
+            profile.update(stacks)
+            # Keep memory bounded: drop the coldest stacks once over the cap
+            if len(profile) > self.max_stacks_per_type:
+                self.profiles[request_type] = Counter(dict(profile.most_common(self.max_stacks_per_type)))
+            totals = self.profile_totals[request_type]
+            totals['profiled_requests'] += 1
+            totals['samples'] += samples
+            totals['seconds'] = round(totals['seconds'] + seconds, 3)
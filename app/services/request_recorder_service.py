@@ -0,0 +1,92 @@
+import hashlib
+import hmac
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+
+def hash_value(value, key, length=16):
+    """
+    Short keyed digest for identifiers and payloads we must not store raw
+    A plain hash of an IPv4 address can be reversed by hashing all 2^32 of them,
+    so digests are HMACs; without the key, log entries cannot be linked back.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    if isinstance(key, str):
+        key = key.encode('utf-8')
+    return hmac.new(key, value, hashlib.sha256).hexdigest()[:length]
+
+
+class RequestRecorderService:
+    """Opt-in, sampled request log written as JSONL by a background thread
+
+    Requests never block on disk: records go onto a bounded queue and are
+    dropped (and counted) if the writer falls behind. Audio is stored as a
+    hash and size only; client IPs and session ids are hashed with `key`.
+    """
+
+    def __init__(self, path, key, sample_rate=1.0, batch_size=100, flush_interval=1.0, max_queue=10000):
+        self.path = path
+        self.key = key
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.recorded = 0
+        self.dropped = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._writer = threading.Thread(target=self._run, name='request-recorder', daemon=True)
+        self._writer.start()
+
+    def should_record(self):
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def hash(self, value):
+        return hash_value(value, self.key)
+
+    def record(self, entry):
+        """Queue one record; never blocks the request thread. 'ts' should be the request's arrival time"""
+        entry.setdefault('ts', time.time())
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def get_stats(self):
+        return {
+            'path': self.path,
+            'sample_rate': self.sample_rate,
+            'recorded': self.recorded,
+            'dropped': self.dropped,
+            'queued': self.queue.qsize(),
+        }
+
+    def _run(self):
+        with open(self.path, 'a', encoding='utf-8') as log_file:
+            while True:
+                batch = [self.queue.get()]
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(self.queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+
+                try:
+                    log_file.write(''.join(json.dumps(entry, separators=(',', ':')) + '\n' for entry in batch))
+                    log_file.flush()
+                    self.recorded += len(batch)
+                except (OSError, TypeError, ValueError) as e:
+                    print(f"Request recorder write failed: {e}")
+                    self.dropped += len(batch)
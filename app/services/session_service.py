@@ -0,0 +1,196 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class SessionContext:
+    """Compact per-session conversation state: the last crop and topic mentioned"""
+
+    __slots__ = ('crop', 'topic', 'turns', 'updated')
+
+    def __init__(self, crop=None, topic=None, turns=0, updated=None):
+        self.crop = crop
+        self.topic = topic
+        self.turns = turns
+        self.updated = updated if updated is not None else time.time()
+
+    def update(self, entities):
+        """Carry entities forward; a turn that names no crop keeps the previous one"""
+        self.crop = entities.get('crop') or self.crop
+        self.topic = entities.get('topic') or self.topic
+        self.turns += 1
+        self.updated = time.time()
+
+    def to_tuple(self):
+        return (self.crop, self.topic, self.turns, self.updated)
+
+    @classmethod
+    def from_tuple(cls, values):
+        return cls(*values)
+
+    def to_dict(self):
+        return {'crop': self.crop, 'topic': self.topic, 'turns': self.turns}
+
+
+class MemorySessionBackend:
+    """In-process LRU backend; bounded by entry count"""
+
+    def __init__(self, max_sessions=10000):
+        self.max_sessions = max_sessions
+        self.records = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, session_id):
+        with self.lock:
+            values = self.records.get(session_id)
+            if values is not None:
+                self.records.move_to_end(session_id)
+            return values
+
+    def set(self, session_id, values):
+        with self.lock:
+            self.records[session_id] = values
+            self.records.move_to_end(session_id)
+            while len(self.records) > self.max_sessions:
+                self.records.popitem(last=False)
+
+    def delete(self, session_id):
+        with self.lock:
+            self.records.pop(session_id, None)
+
+    def sweep(self, cutoff):
+        """Drop expired sessions from the least recently used end; returns how many were removed"""
+        removed = 0
+        with self.lock:
+            while self.records:
+                session_id, values = next(iter(self.records.items()))
+                if values[3] >= cutoff:
+                    break
+                del self.records[session_id]
+                removed += 1
+        return removed
+
+    def __len__(self):
+        return len(self.records)
+
+
+class SqliteSessionBackend:
+    """Local SQLite file backend, so sessions survive restarts and are shared by workers on one host
+
+    SQLite's file locking makes concurrent writes from several worker processes
+    safe, and WAL mode lets readers proceed while another worker writes. Row
+    counts are kept by triggers so stats never scan the table.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            crop TEXT,
+            topic TEXT,
+            turns INTEGER NOT NULL,
+            updated REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated);
+        CREATE TABLE IF NOT EXISTS session_count (n INTEGER NOT NULL);
+        INSERT INTO session_count (n) SELECT COUNT(*) FROM sessions WHERE NOT EXISTS (SELECT 1 FROM session_count);
+        CREATE TRIGGER IF NOT EXISTS sessions_insert AFTER INSERT ON sessions
+            BEGIN UPDATE session_count SET n = n + 1; END;
+        CREATE TRIGGER IF NOT EXISTS sessions_delete AFTER DELETE ON sessions
+            BEGIN UPDATE session_count SET n = n - 1; END;
+    """
+
+    def __init__(self, path, busy_timeout=5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.local = threading.local()
+        connection = self._connection()
+        connection.execute('PRAGMA journal_mode=WAL')
+        # One transaction, so workers starting together create the schema and counter row once
+        connection.executescript('BEGIN IMMEDIATE;' + self.SCHEMA + 'COMMIT;')
+
+    def get(self, session_id):
+        row = self._connection().execute(
+            'SELECT crop, topic, turns, updated FROM sessions WHERE id = ?', (session_id,)).fetchone()
+        return tuple(row) if row else None
+
+    def set(self, session_id, values):
+        self._connection().execute(
+            'INSERT INTO sessions (id, crop, topic, turns, updated) VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT (id) DO UPDATE SET crop = excluded.crop, topic = excluded.topic, '
+            'turns = excluded.turns, updated = excluded.updated',
+            (session_id,) + tuple(values))
+
+    def delete(self, session_id):
+        self._connection().execute('DELETE FROM sessions WHERE id = ?', (session_id,))
+
+    def sweep(self, cutoff):
+        """Delete sessions last updated before cutoff; returns how many were removed"""
+        return self._connection().execute('DELETE FROM sessions WHERE updated < ?', (cutoff,)).rowcount
+
+    def __len__(self):
+        return self._connection().execute('SELECT n FROM session_count').fetchone()[0]
+
+    def _connection(self):
+        # sqlite3 connections must not be shared across threads
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self.local.connection = connection
+        return connection
+
+
+class SessionService:
+    """Session store keyed by a client session id, with TTL expiry over a pluggable backend"""
+
+    MAX_SESSION_ID_LENGTH = 128
+
+    def __init__(self, backend=None, ttl_seconds=1800, sweep_interval=60):
+        self.backend = backend if backend is not None else MemorySessionBackend()
+        self.ttl_seconds = ttl_seconds
+        self.sweep_interval = sweep_interval
+        self.next_sweep = time.time() + sweep_interval
+        self.swept = 0
+
+    def get(self, session_id):
+        """
+        Load a session's context
+        :param session_id: Client-supplied session id
+        :return: SessionContext (fresh if unknown or expired), or None without a usable id
+        """
+        if not self.valid_id(session_id):
+            return None
+
+        values = self.backend.get(session_id)
+        if values is None:
+            return SessionContext()
+
+        context = SessionContext.from_tuple(values)
+        if time.time() - context.updated > self.ttl_seconds:
+            self.backend.delete(session_id)
+            return SessionContext()
+        return context
+
+    def save(self, session_id, context):
+        if context is None or not self.valid_id(session_id):
+            return
+        self.backend.set(session_id, context.to_tuple())
+        self.sweep_if_due()
+
+    def sweep_if_due(self):
+        """Remove expired sessions at most once per sweep_interval, so abandoned ids do not pile up"""
+        now = time.time()
+        if now < self.next_sweep:
+            return 0
+        self.next_sweep = now + self.sweep_interval
+        removed = self.backend.sweep(now - self.ttl_seconds)
+        self.swept += removed
+        return removed
+
+    def valid_id(self, session_id):
+        # Ids come from JSON bodies too, so numbers, lists etc. must be rejected here
+        return isinstance(session_id, str) and 0 < len(session_id) <= self.MAX_SESSION_ID_LENGTH
+
+    def get_stats(self):
+        return {'sessions': len(self.backend), 'ttl_seconds': self.ttl_seconds, 'expired_swept': self.swept}
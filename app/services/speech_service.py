@@ -1,8 +1,13 @@
 from google.cloud import speech_v1p1beta1 as speech
 import os
+from .audio_normalizer import AudioNormalizer, TARGET_SAMPLE_RATE
+from .deadline import Deadline, record_miss
 
 class SpeechToTextService:
     def __init__(self):
+        # Normalize every upload to 16 kHz mono LINEAR16 so the config never has to be guessed
+        self.normalizer = AudioNormalizer()
+
         # Initialize the Google Cloud Speech client
         self.mock_mode = False
         try:
@@ -42,13 +47,16 @@ class SpeechToTextService:
             else:
                 print(f"API test completed (expected failure with test data): {e}")
 
-    def transcribe_audio(self, audio_file_path, language_code='zu-ZA'):
+    def transcribe_audio(self, audio_file_path, language_code='zu-ZA', deadline=None):
         """
         Transcribes audio file to text using Google Cloud Speech API
         :param audio_file_path: Path to the audio file
         :param language_code: Language code for isiZulu (zu-ZA)
+        :param deadline: Request Deadline bounding every recognize call
         :return: Transcribed text
         """
+        if deadline is None:
+            deadline = Deadline()
         print(f"DEBUG: Starting transcription for file: {audio_file_path}")
         print(f"DEBUG: Mock mode: {self.mock_mode}")
         print(f"DEBUG: Requested language: {language_code}")
@@ -64,8 +72,13 @@ class SpeechToTextService:
             print(f"DEBUG: Audio file size: {len(content)} bytes")
             print(f"DEBUG: First 10 bytes (hex): {content[:10].hex() if len(content) >= 10 else 'N/A'}")
 
-            # Determine encoding based on file content
-            if content.startswith(b'\x1a\x45\xdf\xa3'):
+            # Normalize once; fall back to guessing the encoding only if decoding fails
+            original_size = len(content)
+            normalized = self._normalize_content(content)
+            if normalized is not None:
+                content = normalized
+                config = self._linear16_config(language_code)
+            elif content.startswith(b'\x1a\x45\xdf\xa3'):
                 print("DEBUG: Detected WebM format")
                 config = speech.RecognitionConfig(
                     encoding=speech.RecognitionConfig.AudioEncoding.WEBM_OPUS,
@@ -118,7 +131,7 @@ class SpeechToTextService:
             )
 
             print(f"DEBUG: Sending English request to Google Cloud Speech API with config: encoding={english_config.encoding}, sample_rate={getattr(english_config, 'sample_rate_hertz', 'unspecified')}, language={english_config.language_code}")
-            english_response = self.client.recognize(config=english_config, audio=audio)
+            english_response = self.client.recognize(config=english_config, audio=audio, timeout=deadline.timeout())
             print(f"DEBUG: English API response received: {len(english_response.results)} results")
 
             # Extract English transcript
@@ -133,9 +146,12 @@ class SpeechToTextService:
             english_transcript = english_transcript.strip()
             print(f"DEBUG: English transcript: '{english_transcript}' (confidence: {english_confidence})")
 
-            # Now try isiZulu
-            print(f"DEBUG: Sending isiZulu request to Google Cloud Speech API with config: encoding={config.encoding}, sample_rate={getattr(config, 'sample_rate_hertz', 'unspecified')}, language={config.language_code}")
-            response = self.client.recognize(config=config, audio=audio)
+            # Now try isiZulu, unless the English pass left too little budget for a second call
+            if english_transcript and not deadline.allows('recognize'):
+                response = speech.RecognizeResponse()
+            else:
+                print(f"DEBUG: Sending isiZulu request to Google Cloud Speech API with config: encoding={config.encoding}, sample_rate={getattr(config, 'sample_rate_hertz', 'unspecified')}, language={config.language_code}")
+                response = self.client.recognize(config=config, audio=audio, timeout=deadline.timeout())
             print(f"DEBUG: isiZulu API response received: {len(response.results)} results")
 
             # Extract isiZulu transcript
@@ -167,14 +183,16 @@ class SpeechToTextService:
             print(f"DEBUG: Final transcript: '{final_transcript}'")
 
             # If no transcript and file is small, it might be too short
-            if not final_transcript and len(content) < 50000:  # Less than 50KB
-                print(f"DEBUG: Audio file too small ({len(content)} bytes), likely no speech captured")
+            if not final_transcript and original_size < 50000:  # Less than 50KB as uploaded
+                print(f"DEBUG: Audio file too small ({original_size} bytes), likely no speech captured")
                 return ""
 
             return final_transcript
 
         except Exception as e:
             error_str = str(e).lower()
+            if "deadline" in error_str:
+                record_miss('recognize')
             # Check if this is an API disabled or authentication error
             if "service_disabled" in error_str or "403" in error_str or "not enabled" in error_str:
                 print(f"Google Cloud API error detected: {e}")
@@ -191,7 +209,7 @@ class SpeechToTextService:
                         enable_automatic_punctuation=True,
                         enable_word_time_offsets=False,
                     )
-                    response = self.client.recognize(config=config_no_rate, audio=audio)
+                    response = self.client.recognize(config=config_no_rate, audio=audio, timeout=deadline.timeout())
                     print(f"Retry API response received: {len(response.results)} results")
 
                     transcript = ""
@@ -211,13 +229,16 @@ class SpeechToTextService:
             else:
                 raise Exception(f"Error transcribing audio: {str(e)}")
 
-    def transcribe_audio_stream(self, audio_stream, language_code='zu-ZA'):
+    def transcribe_audio_stream(self, audio_stream, language_code='zu-ZA', deadline=None):
         """
         Transcribes audio stream to text
         :param audio_stream: Audio stream data
         :param language_code: Language code
+        :param deadline: Request Deadline bounding every recognize call
         :return: Transcribed text
         """
+        if deadline is None:
+            deadline = Deadline()
         print(f"DEBUG: Starting stream transcription, data size: {len(audio_stream)} bytes")
         print(f"DEBUG: First 10 bytes (hex): {audio_stream[:10].hex() if len(audio_stream) >= 10 else 'N/A'}")
         print(f"DEBUG: Mock mode: {self.mock_mode}")
@@ -226,20 +247,25 @@ class SpeechToTextService:
             return self._mock_transcription("stream")
 
         try:
-            audio = speech.RecognitionAudio(content=audio_stream)
+            normalized = self._normalize_content(audio_stream)
+            if normalized is not None:
+                audio = speech.RecognitionAudio(content=normalized)
+                config = self._linear16_config(language_code)
+            else:
+                audio = speech.RecognitionAudio(content=audio_stream)
 
-            # For browser-recorded audio streams, it's almost always WebM/Opus
-            # Force WebM_OPUS encoding for all stream data from browser
-            print("DEBUG: Using WEBM_OPUS encoding for browser stream audio")
-            config = speech.RecognitionConfig(
-                encoding=speech.RecognitionConfig.AudioEncoding.WEBM_OPUS,
-                sample_rate_hertz=48000,  # Standard for WebM/Opus
-                language_code=language_code,
-                enable_automatic_punctuation=True,
-            )
+                # For browser-recorded audio streams, it's almost always WebM/Opus
+                # Force WebM_OPUS encoding for all stream data from browser
+                print("DEBUG: Using WEBM_OPUS encoding for browser stream audio")
+                config = speech.RecognitionConfig(
+                    encoding=speech.RecognitionConfig.AudioEncoding.WEBM_OPUS,
+                    sample_rate_hertz=48000,  # Standard for WebM/Opus
+                    language_code=language_code,
+                    enable_automatic_punctuation=True,
+                )
 
             print(f"DEBUG: Sending stream request to Google Cloud Speech API with config: encoding={config.encoding}, sample_rate={getattr(config, 'sample_rate_hertz', 'unspecified')}, language={config.language_code}")
-            response = self.client.recognize(config=config, audio=audio)
+            response = self.client.recognize(config=config, audio=audio, timeout=deadline.timeout())
             print(f"DEBUG: Stream API response received: {len(response.results)} results")
 
             transcript = ""
@@ -253,6 +279,8 @@ class SpeechToTextService:
 
         except Exception as e:
             error_str = str(e).lower()
+            if "deadline" in error_str:
+                record_miss('recognize')
             # Check if this is an API disabled or authentication error
             if "service_disabled" in error_str or "403" in error_str or "not enabled" in error_str:
                 print(f"Google Cloud API error detected: {e}")
@@ -268,7 +296,7 @@ class SpeechToTextService:
                         language_code=language_code,
                         enable_automatic_punctuation=True,
                     )
-                    response = self.client.recognize(config=config_no_rate, audio=audio)
+                    response = self.client.recognize(config=config_no_rate, audio=audio, timeout=deadline.timeout())
                     print(f"Stream retry API response received: {len(response.results)} results")
 
                     transcript = ""
@@ -289,6 +317,29 @@ class SpeechToTextService:
             else:
                 raise Exception(f"Error transcribing audio stream: {str(e)}")
 
+    def _normalize_content(self, content):
+        """
+        Decode and resample audio to 16 kHz mono LINEAR16 bytes
+        :param content: Raw audio bytes in any supported container
+        :return: LINEAR16 bytes, or None if the audio could not be decoded
+        """
+        try:
+            return self.normalizer.to_linear16(self.normalizer.normalize(content))
+        except Exception as e:
+            print(f"Audio normalization failed: {e}. Falling back to encoding detection.")
+            return None
+
+    def _linear16_config(self, language_code):
+        """Recognition config matching the normalizer's canonical output"""
+        return speech.RecognitionConfig(
+            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+            sample_rate_hertz=TARGET_SAMPLE_RATE,
+            audio_channel_count=1,
+            language_code=language_code,
+            enable_automatic_punctuation=True,
+            enable_word_time_offsets=False,
+        )
+
     def _mock_transcription(self, source):
         """
         Mock transcription for testing when API is not available
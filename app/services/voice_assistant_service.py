@@ -1,10 +1,14 @@
 import os
 import tempfile
 import base64
+import threading
+from collections import OrderedDict
 import whisper
 from googletrans import Translator
 from gtts import gTTS
 from .farming_advice_service import FarmingAdviceService
+from .audio_normalizer import AudioNormalizer
+from .deadline import Deadline, DeadlineExceeded, WorkerUnavailable
 import firebase_config
 
 # Set FFmpeg path for Whisper
@@ -24,8 +28,14 @@ class VoiceAssistantService:
         self.whisper_model = whisper.load_model("base")
         print("Whisper model loaded successfully!")
 
-        # Initialize translator
+        # Decode uploads once into the 16 kHz mono samples Whisper consumes
+        self.normalizer = AudioNormalizer()
+
+        # Initialize translator, with a small cache so repeated phrases survive a tight deadline
         self.translator = Translator()
+        self.translation_cache = OrderedDict()
+        self.translation_cache_size = 512
+        self.translation_cache_lock = threading.Lock()
 
         # Initialize farming advice service
         self.farming_service = FarmingAdviceService()
@@ -36,27 +46,46 @@ class VoiceAssistantService:
         except Exception as e:
             print(f"Firebase initialization failed: {e}. Audio storage will be disabled.")
 
-    def process_voice_query(self, audio_base64):
-        """Complete workflow: Zulu audio -> English text -> farming advice -> Zulu audio response"""
+    def process_voice_query(self, audio_base64, skip_audio=False, deadline=None, context=None):
+        """Complete workflow: Zulu audio -> English text -> farming advice -> Zulu audio response
+
+        skip_audio drops the gTTS/Firebase step so text advice is still served under load.
+        deadline bounds the whole pipeline; stages fall back to cheaper answers as it runs out.
+        context is the caller's SessionContext; it is updated in place with this turn's entities.
+        Raises WorkerUnavailable when every transcription worker is busy.
+        """
+        if deadline is None:
+            deadline = Deadline()
+
         try:
-            # Step 1: Decode and save audio temporarily
+            # Step 1: Decode and normalize audio to 16 kHz mono
             audio_data = base64.b64decode(audio_base64)
-            with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-                temp_file.write(audio_data)
-                temp_audio_path = temp_file.name
+            temp_audio_path = None
+            try:
+                whisper_input = self.normalizer.to_float32(self.normalizer.normalize(audio_data))
+                print(f"Normalized audio: {len(whisper_input)} samples")
+            except Exception as e:
+                # Let Whisper's own FFmpeg loader have a go at anything we could not decode
+                print(f"Audio normalization failed: {e}. Passing raw file to Whisper.")
+                with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
+                    temp_file.write(audio_data)
+                    temp_audio_path = temp_file.name
+                whisper_input = temp_audio_path
 
             try:
                 # Step 2: Speech-to-Text using Whisper (Zulu)
                 print("Transcribing audio with Whisper...")
-                print(f"Audio file path: {temp_audio_path}")
-                print(f"File exists: {os.path.exists(temp_audio_path)}")
-                print(f"File size: {os.path.getsize(temp_audio_path) if os.path.exists(temp_audio_path) else 'N/A'} bytes")
+                print(f"Audio size: {len(audio_data)} bytes")
 
                 # Try real Whisper transcription first, fallback to mock if it fails
                 try:
-                    result = self.whisper_model.transcribe(temp_audio_path, language="zu")
+                    if not deadline.allows('transcription'):
+                        raise DeadlineExceeded('transcription')
+                    result = deadline.run('transcription', self.whisper_model.transcribe, whisper_input, language="zu")
                     zulu_text = result["text"].strip()
                     print(f"Real Whisper transcription: {zulu_text}")
+                except (DeadlineExceeded, WorkerUnavailable):
+                    raise
                 except Exception as e:
                     print(f"Whisper transcription failed: {e}. Using mock transcription.")
                     # Mock transcription for testing when audio is invalid
@@ -65,56 +94,48 @@ class VoiceAssistantService:
 
                 if not zulu_text:
                     zulu_text = "Ngizwa kahle, kodwa angizwanga kahle. Ngicela uphinde usho kabusha."
-                    return self._create_response(zulu_text, "I heard you, but not clearly. Please repeat.", zulu_text)
+                    return self._create_response(zulu_text, "I heard you, but not clearly. Please repeat.", zulu_text, skip_audio, deadline)
 
                 print(f"Zulu transcription: {zulu_text}")
 
                 # Step 3: Translate Zulu to English
                 print("Translating to English...")
                 try:
-                    english_translation = self.translator.translate(zulu_text, src='zu', dest='en').text
+                    english_translation = self._translate(zulu_text, 'zu', 'en', 'translation', deadline)
                     print(f"English translation: {english_translation}")
                 except Exception as e:
                     print(f"Translation failed: {e}. Using mock translation.")
-                    # Mock translation for offline testing
-                    if "utamatisi" in zulu_text.lower():
-                        english_translation = "When should I plant tomatoes?"
-                    elif "isitshalo" in zulu_text.lower():
-                        english_translation = "How do I care for my plants?"
-                    elif "nambuzane" in zulu_text.lower():
-                        english_translation = "How do I control pests?"
-                    else:
-                        english_translation = "I need farming advice."
+                    english_translation = self._mock_english_translation(zulu_text)
                     print(f"Mock English translation: {english_translation}")
 
                 # Step 4: Generate farming advice in English
                 print("Generating farming advice...")
-                farming_advice_en = self.farming_service.get_comprehensive_advice(english_translation)
+                farming_advice_en = self.farming_service.get_comprehensive_advice(english_translation, context)
+                if context is not None:
+                    context.update(self.farming_service.extract_entities(english_translation))
                 print(f"Farming advice: {farming_advice_en}")
 
                 # Step 5: Translate advice back to Zulu
                 print("Translating advice back to Zulu...")
                 try:
-                    zulu_advice = self.translator.translate(farming_advice_en, src='en', dest='zu').text
+                    zulu_advice = self._translate(farming_advice_en, 'en', 'zu', 'back_translation', deadline)
                     print(f"Zulu advice: {zulu_advice}")
                 except Exception as e:
                     print(f"Back translation failed: {e}. Using mock Zulu response.")
-                    # Mock Zulu response for offline testing
-                    if "tomato" in farming_advice_en.lower():
-                        zulu_advice = "Utamatisi: Tshala phakathi kukaMeyi noJuni lapho inhlabathi ifudumele. Hlukanisa izitshalo ngamasentimitha angu-45-60."
-                    elif "plant" in farming_advice_en.lower():
-                        zulu_advice = "Ukutshala: Khetha isikhathi esifanele sesilimo ngasinye. Iningi lemifino likhula kahle entwasahlobo nasehlobo."
-                    else:
-                        zulu_advice = "Iseluleko sokulima: Sebenzisa izindlela ezisimeme, hlola izitshalo zakho njalo, gcina inhlabathi."
+                    zulu_advice = self._mock_zulu_advice(farming_advice_en)
                     print(f"Mock Zulu advice: {zulu_advice}")
 
                 # Step 6: Generate audio response using gTTS
-                print("Generating audio response...")
-                try:
-                    audio_response_url = self._generate_audio_response(zulu_advice)
-                except Exception as e:
-                    print(f"Audio generation failed: {e}. Audio response will be disabled.")
+                if skip_audio or not deadline.allows('tts'):
+                    print("Skipping audio response (degraded mode or deadline)")
                     audio_response_url = None
+                else:
+                    print("Generating audio response...")
+                    try:
+                        audio_response_url = self._generate_audio_response(zulu_advice, deadline)
+                    except Exception as e:
+                        print(f"Audio generation failed: {e}. Audio response will be disabled.")
+                        audio_response_url = None
 
                 return {
                     'success': True,
@@ -127,9 +148,21 @@ class VoiceAssistantService:
 
             finally:
                 # Clean up temp file
-                if os.path.exists(temp_audio_path):
+                if temp_audio_path and os.path.exists(temp_audio_path):
                     os.unlink(temp_audio_path)
 
+        except DeadlineExceeded as e:
+            print(f"Voice assistant deadline exceeded: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'zulu_advice': "Kuthathe isikhathi eside kakhulu. Ngicela uzame futhi.",
+                'english_translation': 'That took too long. Please try again.',
+                'audio_response_url': None
+            }
+        except WorkerUnavailable:
+            # Every Whisper worker is busy; let the route shed the request with a 503
+            raise
         except Exception as e:
             print(f"Voice assistant error: {e}")
             import traceback
@@ -143,11 +176,49 @@ class VoiceAssistantService:
                 'audio_response_url': None
             }
 
-    def _generate_audio_response(self, zulu_text):
+    def _translate(self, text, src, dest, stage, deadline):
+        """Translate via the cache or googletrans; raises if the deadline leaves no time"""
+        key = (src, dest, text)
+        with self.translation_cache_lock:
+            if key in self.translation_cache:
+                self.translation_cache.move_to_end(key)
+                return self.translation_cache[key]
+
+        if not deadline.allows(stage):
+            raise DeadlineExceeded(stage)
+        translated = deadline.run(stage, self.translator.translate, text, src=src, dest=dest).text
+
+        with self.translation_cache_lock:
+            self.translation_cache[key] = translated
+            while len(self.translation_cache) > self.translation_cache_size:
+                self.translation_cache.popitem(last=False)
+        return translated
+
+    def _mock_english_translation(self, zulu_text):
+        """Phrase-table translation for offline testing or when the deadline is tight"""
+        if "utamatisi" in zulu_text.lower():
+            return "When should I plant tomatoes?"
+        elif "isitshalo" in zulu_text.lower():
+            return "How do I care for my plants?"
+        elif "nambuzane" in zulu_text.lower():
+            return "How do I control pests?"
+        return "I need farming advice."
+
+    def _mock_zulu_advice(self, farming_advice_en):
+        """Phrase-table Zulu response for offline testing or when the deadline is tight"""
+        if "tomato" in farming_advice_en.lower():
+            return "Utamatisi: Tshala phakathi kukaMeyi noJuni lapho inhlabathi ifudumele. Hlukanisa izitshalo ngamasentimitha angu-45-60."
+        elif "plant" in farming_advice_en.lower():
+            return "Ukutshala: Khetha isikhathi esifanele sesilimo ngasinye. Iningi lemifino likhula kahle entwasahlobo nasehlobo."
+        return "Iseluleko sokulima: Sebenzisa izindlela ezisimeme, hlola izitshalo zakho njalo, gcina inhlabathi."
+
+    def _generate_audio_response(self, zulu_text, deadline=None):
         """Generate Zulu audio response using gTTS and upload to Firebase"""
+        if deadline is None:
+            deadline = Deadline()
         try:
             # Generate speech
-            tts = gTTS(zulu_text, lang='zu', slow=False)
+            tts = gTTS(zulu_text, lang='zu', slow=False, timeout=deadline.timeout())
 
             # Save to temporary file
             with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as temp_audio:
@@ -160,8 +231,10 @@ class VoiceAssistantService:
                     audio_data = f.read()
 
                 # Upload to Firebase Storage
+                if not deadline.allows('upload'):
+                    return None
                 filename = f"response_{os.urandom(8).hex()}.mp3"
-                audio_url = firebase_config.upload_audio_to_firebase(audio_data, filename)
+                audio_url = firebase_config.upload_audio_to_firebase(audio_data, filename, timeout=deadline.timeout())
 
                 return audio_url
 
@@ -174,10 +247,10 @@ class VoiceAssistantService:
             print(f"Audio generation error: {e}")
             return None
 
-    def _create_response(self, zulu_text, english_text, zulu_advice):
+    def _create_response(self, zulu_text, english_text, zulu_advice, skip_audio=False, deadline=None):
         """Create response when transcription fails"""
         try:
-            audio_url = self._generate_audio_response(zulu_advice)
+            audio_url = None if skip_audio else self._generate_audio_response(zulu_advice, deadline)
             return {
                 'success': True,
                 'original_zulu': zulu_text,
@@ -0,0 +1,76 @@
+// AgriNathi offline support: registers the service worker and answers questions on the device
+(function () {
+    const MANIFEST_URL = '/offline/manifest.json';
+    let bundlePromise = null;
+
+    if ('serviceWorker' in navigator) {
+        window.addEventListener('load', () => {
+            navigator.serviceWorker.register('/service-worker.js')
+                .then(registration => {
+                    // Pick up a newer bundle once we are back online
+                    window.addEventListener('online', () => {
+                        if (registration.active) {
+                            registration.active.postMessage('refresh-bundle');
+                        }
+                    });
+                })
+                .catch(error => console.log('Service worker registration failed:', error));
+        });
+    }
+
+    async function loadBundle() {
+        if (!bundlePromise) {
+            bundlePromise = (async () => {
+                const manifest = await (await fetch(MANIFEST_URL)).json();
+                const knowledge = await (await fetch(manifest.base_url + 'knowledge.json')).json();
+                knowledge.baseUrl = manifest.base_url;
+                return knowledge;
+            })().catch(error => {
+                bundlePromise = null;
+                throw error;
+            });
+        }
+        return bundlePromise;
+    }
+
+    // Same matching rules as FarmingAdviceService: first keyword, in order, contained in the query
+    function matchEntry(knowledge, englishQuery) {
+        const query = englishQuery.toLowerCase();
+        return knowledge.entries.find(entry => query.includes(entry.keyword)) || null;
+    }
+
+    // Known quick-question phrases go straight to their knowledge base entry;
+    // anything else (e.g. typed English) is matched by keyword
+    function findPhrase(knowledge, zuluText) {
+        const text = zuluText.toLowerCase();
+        for (const [phrase, target] of Object.entries(knowledge.phrases)) {
+            if (text.includes(phrase)) {
+                return target;
+            }
+        }
+        return null;
+    }
+
+    async function answer(question) {
+        const knowledge = await loadBundle();
+        const phrase = findPhrase(knowledge, question);
+        let entry;
+        if (phrase) {
+            entry = phrase.keyword ? knowledge.entries.find(item => item.keyword === phrase.keyword) : null;
+        } else {
+            entry = matchEntry(knowledge, question);
+        }
+        entry = entry || knowledge.default;
+        return {
+            success: true,
+            offline: true,
+            original_zulu: question,
+            english_translation: phrase ? phrase.en : question,
+            farming_advice_en: entry.en,
+            zulu_advice: entry.zu || entry.en,
+            audio_response_url: entry.audio ? knowledge.baseUrl + entry.audio : null
+        };
+    }
+
+    window.AgriNathiOffline = { answer: answer, loadBundle: loadBundle };
+})();
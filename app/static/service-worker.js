@@ -0,0 +1,102 @@
+// AgriNathi service worker: precaches the offline bundle and serves pages offline
+const MANIFEST_URL = '/offline/manifest.json';
+const PAGE_CACHE = 'agrinathi-pages-v1';
+const BUNDLE_CACHE_PREFIX = 'agrinathi-bundle-';
+const PAGES = ['/', '/voice-recognition', '/weather', '/plant-scan', '/static/offline.js'];
+
+async function cacheBundle() {
+    const response = await fetch(MANIFEST_URL, { cache: 'no-cache' });
+    if (!response.ok) {
+        throw new Error('Manifest unavailable: ' + response.status);
+    }
+    const manifest = await response.clone().json();
+    const cacheName = BUNDLE_CACHE_PREFIX + manifest.version;
+
+    // Bundle URLs are content-addressed, so an existing cache is already complete
+    if (!(await caches.has(cacheName))) {
+        const cache = await caches.open(cacheName);
+        await cache.addAll(manifest.assets.map(asset => manifest.base_url + asset));
+    }
+
+    const pages = await caches.open(PAGE_CACHE);
+    await pages.put(MANIFEST_URL, response);
+
+    // Drop bundles superseded by this version
+    const names = await caches.keys();
+    await Promise.all(names
+        .filter(name => name.startsWith(BUNDLE_CACHE_PREFIX) && name !== cacheName)
+        .map(name => caches.delete(name)));
+    return manifest;
+}
+
+self.addEventListener('install', event => {
+    event.waitUntil((async () => {
+        const pages = await caches.open(PAGE_CACHE);
+        await pages.addAll(PAGES);
+        await cacheBundle();
+        await self.skipWaiting();
+    })());
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(self.clients.claim());
+});
+
+self.addEventListener('message', event => {
+    if (event.data === 'refresh-bundle') {
+        event.waitUntil(cacheBundle().catch(error => console.log('Bundle refresh failed:', error)));
+    }
+});
+
+async function cacheFirst(request) {
+    const cached = await caches.match(request);
+    return cached || fetch(request);
+}
+
+async function staleWhileRevalidate(request, event) {
+    const cache = await caches.open(PAGE_CACHE);
+    const cached = await cache.match(request);
+    const network = fetch(request).then(response => {
+        if (response.ok || response.type === 'opaque') {
+            cache.put(request, response.clone());
+        }
+        return response;
+    });
+    if (cached) {
+        event.waitUntil(network.catch(() => null));
+        return cached;
+    }
+    return network;
+}
+
+async function networkFirst(request) {
+    try {
+        const response = await fetch(request);
+        const cache = await caches.open(PAGE_CACHE);
+        cache.put(request, response.clone());
+        return response;
+    } catch (error) {
+        const cached = await caches.match(request);
+        if (cached) {
+            return cached;
+        }
+        throw error;
+    }
+}
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') {
+        return;  // Voice queries always go to the network
+    }
+
+    const url = new URL(request.url);
+    if (url.origin === self.location.origin && url.pathname === MANIFEST_URL) {
+        event.respondWith(networkFirst(request));
+    } else if (url.origin === self.location.origin && url.pathname.startsWith('/offline/')) {
+        event.respondWith(cacheFirst(request));
+    } else if (request.mode === 'navigate' || PAGES.includes(url.pathname)
+               || url.hostname.endsWith('jsdelivr.net') || url.hostname.endsWith('cloudflare.com')) {
+        event.respondWith(staleWhileRevalidate(request, event));
+    }
+});
@@ -29,13 +29,13 @@ def initialize_firebase():
 
     return True
 
-def upload_audio_to_firebase(audio_data, filename):
+def upload_audio_to_firebase(audio_data, filename, timeout=60):
     """Upload audio data to Firebase Storage"""
     try:
         bucket = storage.bucket()
         blob = bucket.blob(f'audio/{filename}')
-        blob.upload_from_string(audio_data, content_type='audio/webm')
-        blob.make_public()
+        blob.upload_from_string(audio_data, content_type='audio/webm', timeout=timeout)
+        blob.make_public(timeout=timeout)
         return blob.public_url
     except Exception as e:
         print(f"Error uploading to Firebase: {e}")
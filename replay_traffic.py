@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+AgriNathi - Traffic replay load generator
+
+Re-drives a request log recorded with REQUEST_LOG_PATH against the app.
+By default the app is built in-process with a stand-in voice assistant that
+reproduces each request's recorded latency and transcript, so admission
+control, deadlines, sessions and the knowledge base run for real while
+Whisper, translation and TTS are simulated. Use --url to replay against a
+running server instead.
+
+Each recorded client is replayed as its hashed id in X-Forwarded-For. The
+in-process app trusts that header, so per-client rate limits replay as
+recorded. A --url target only honours it when the replay tool is its last
+proxy hop: run the server with TRUSTED_PROXY_HOPS=1 and connect to it
+directly, not through the Heroku router, which appends the tool's own
+address. Otherwise every request counts as one client and most get a 429;
+raise CLIENT_RATE_PER_MINUTE / CLIENT_BURST on the target if you cannot.
+
+Usage:
+    python replay_traffic.py requests.log --speed 2 --workers 8
+"""
+
+import argparse
+import base64
+import io
+import json
+import os
+import struct
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import wave
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+
+from app import create_app
+from services.farming_advice_service import FarmingAdviceService
+
+REPLAY_SAMPLE_RATE = 16000
+WAV_HEADER_SIZE = 44  # wave module writes the canonical header; the marker follows it
+
+
+def load_log(path, endpoint='voice_query'):
+    """Recorded entries for one endpoint, oldest first"""
+    records = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('endpoint') == endpoint:
+                records.append(record)
+    records.sort(key=lambda record: record['ts'])
+    return records
+
+
+def synthetic_audio(seconds, index):
+    """Silent 16 kHz WAV of the recorded duration; the first samples carry the record index"""
+    frames = int(seconds * REPLAY_SAMPLE_RATE)
+    samples = bytearray(max(frames * 2, 4))
+    samples[:4] = struct.pack('<I', index)
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(REPLAY_SAMPLE_RATE)
+        wav_file.writeframes(bytes(samples))
+    return base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def audio_index(audio_base64):
+    """Record index embedded by synthetic_audio; only the first 64 base64 characters are decoded"""
+    try:
+        header = base64.b64decode(audio_base64[:64])
+        return struct.unpack('<I', header[WAV_HEADER_SIZE:WAV_HEADER_SIZE + 4])[0]
+    except (ValueError, struct.error):
+        return None
+
+
+class ReplayVoiceAssistant:
+    """Stand-in for VoiceAssistantService that replays recorded latency and transcripts"""
+
+    def __init__(self, records, latency_scale=1.0):
+        self.latency_scale = latency_scale
+        self.farming_service = FarmingAdviceService()
+        self.records = records
+
+    def process_voice_query(self, audio_base64, skip_audio=False, deadline=None, context=None):
+        index = audio_index(audio_base64)
+        record = self.records[index] if index is not None and index < len(self.records) else {}
+        latency = record.get('latency_ms', 0) / 1000.0 * self.latency_scale
+        if deadline is not None and latency > deadline.remaining():
+            time.sleep(deadline.remaining())
+            return {'success': False, 'error': 'Deadline exceeded during replay', 'audio_response_url': None}
+        time.sleep(latency)
+
+        english = record.get('english_translation') or 'I need farming advice.'
+        advice = self.farming_service.get_comprehensive_advice(english, context)
+        if context is not None:
+            context.update(self.farming_service.extract_entities(english))
+        return {
+            'success': True,
+            'original_zulu': record.get('original_zulu') or '',
+            'english_translation': english,
+            'farming_advice_en': advice,
+            'zulu_advice': advice,
+            'audio_response_url': None
+        }
+
+
+def send_in_process(app, payload, headers):
+    client = app.test_client()
+    response = client.post('/voice-query', json=payload, headers=headers)
+    return response.status_code, response.get_json(silent=True) or {}
+
+
+def send_http(url, payload, headers):
+    request = urllib.request.Request(url.rstrip('/') + '/voice-query',
+                                     data=json.dumps(payload).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json', **headers})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.loads(response.read() or b'{}')
+    except urllib.error.HTTPError as e:
+        return e.code, {}
+
+
+def replay(records, send, speed=1.0, workers=8):
+    """
+    Re-issue recorded requests at their original spacing divided by speed (0 = as fast as possible)
+    Audio payloads are built when each request is sent, so memory stays flat however long the log is.
+    :param records: Recorded entries, oldest first
+    :return: List of (record, status, latency_ms, body)
+    """
+    results = []
+    results_lock = threading.Lock()
+    start = time.monotonic()
+    first_ts = records[0]['ts'] if records else 0
+
+    def issue(index, record):
+        payload = {'audio': synthetic_audio(record.get('audio_seconds', 1.0), index)}
+        headers = {}
+        # Hashed ids keep clients and sessions distinct; see the module docstring for --url caveats
+        if record.get('client'):
+            headers['X-Forwarded-For'] = record['client']
+        if record.get('session'):
+            headers['X-Session-Id'] = record['session']
+        if record.get('budget_ms'):
+            headers['X-Request-Budget-Ms'] = str(record['budget_ms'])
+
+        began = time.perf_counter()
+        status, body = send(payload, headers)
+        latency_ms = (time.perf_counter() - began) * 1000
+        with results_lock:
+            results.append((record, status, latency_ms, body))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for index, record in enumerate(records):
+            if speed > 0:
+                delay = (record['ts'] - first_ts) / speed - (time.monotonic() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            pool.submit(issue, index, record)
+    return results
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 1)
+
+
+def lru_hit_rate(keys, size):
+    """Hit rate an LRU cache of the given size would achieve over the key sequence"""
+    cache = OrderedDict()
+    hits = 0
+    for key in keys:
+        if key in cache:
+            hits += 1
+            cache.move_to_end(key)
+        else:
+            cache[key] = True
+            if len(cache) > size:
+                cache.popitem(last=False)
+    return round(hits / len(keys), 3) if keys else None
+
+
+def summarize(records, results, cache_sizes):
+    latencies = [latency for _, status, latency, _ in results if status == 200]
+    # Rejected requests never reached the pipeline, so they carry no transcript
+    queries = [record['english_translation'].lower() for record in records if record.get('english_translation')]
+    audio = [record['audio_hash'] for record in records if record.get('audio_hash')]
+    return {
+        'requests': len(results),
+        'status_counts': dict(Counter(status for _, status, _, _ in results)),
+        'degraded': sum(1 for _, _, _, body in results if body.get('degraded')),
+        'latency_ms': {
+            'p50': percentile(latencies, 0.50),
+            'p90': percentile(latencies, 0.90),
+            'p99': percentile(latencies, 0.99),
+            'recorded_p50': percentile([record.get('latency_ms', 0) for record in records], 0.50),
+        },
+        'cache_hit_rates': {
+            str(size): {'query': lru_hit_rate(queries, size), 'audio': lru_hit_rate(audio, size)}
+            for size in cache_sizes
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay recorded AgriNathi traffic')
+    parser.add_argument('log', help='JSONL request log written via REQUEST_LOG_PATH')
+    parser.add_argument('--speed', type=float, default=1.0, help='Rate multiplier; 0 replays as fast as possible')
+    parser.add_argument('--workers', type=int, default=8, help='Concurrent client threads')
+    parser.add_argument('--url', help='Replay against a running server instead of an in-process app')
+    parser.add_argument('--latency-scale', type=float, default=1.0,
+                        help='Scale recorded service latency in the in-process stand-in')
+    parser.add_argument('--cache-sizes', default='64,256,1024', help='LRU sizes to simulate hit rates for')
+    args = parser.parse_args()
+
+    records = load_log(args.log)
+    if not records:
+        print(f"No voice queries found in {args.log}")
+        return
+
+    if args.url:
+        send = lambda payload, headers: send_http(args.url, payload, headers)
+    else:
+        app = create_app(voice_assistant=ReplayVoiceAssistant(records, latency_scale=args.latency_scale))
+        send = lambda payload, headers: send_in_process(app, payload, headers)
+
+    print(f"Replaying {len(records)} voice queries at {args.speed}x with {args.workers} workers...")
+    results = replay(records, send, speed=args.speed, workers=args.workers)
+    cache_sizes = [int(size) for size in args.cache_sizes.split(',') if size]
+    print(json.dumps(summarize(records, results, cache_sizes), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,8 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The app imports its services as a top-level `services` package (see create_app)
+sys.path.insert(0, os.path.join(ROOT, 'app'))
+sys.path.insert(1, ROOT)
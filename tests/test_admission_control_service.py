@@ -0,0 +1,117 @@
+import base64
+import struct
+
+import pytest
+
+from services import admission_control_service
+from services.admission_control_service import AdmissionControlService, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(admission_control_service.time, 'monotonic', fake)
+    return fake
+
+
+def wav_base64(seconds, sample_rate=16000):
+    data = b'\0' * int(seconds * sample_rate * 2)
+    header = (b'RIFF' + struct.pack('<I', 36 + len(data)) + b'WAVEfmt '
+              + struct.pack('<IHHIIHH', 16, 1, 1, sample_rate, sample_rate * 2, 2, 16)
+              + b'data' + struct.pack('<I', len(data)))
+    return base64.b64encode(header + data).decode('ascii')
+
+
+def test_token_bucket_allows_burst_then_refills(clock):
+    bucket = TokenBucket(rate=1.0, capacity=2)
+    assert bucket.consume() == (True, 0)
+    assert bucket.consume() == (True, 0)
+
+    allowed, retry_after = bucket.consume()
+    assert not allowed
+    assert retry_after == pytest.approx(1.0)
+
+    clock.now += 1.0
+    assert bucket.consume() == (True, 0)
+
+
+def test_token_bucket_never_exceeds_capacity(clock):
+    bucket = TokenBucket(rate=1.0, capacity=2)
+    clock.now += 60
+    assert bucket.consume(2)[0]
+    assert not bucket.consume()[0]
+
+
+def test_rate_limit_returns_429_with_retry_after(clock):
+    service = AdmissionControlService(client_rate_per_minute=60, client_burst=1)
+    service.admit('10.0.0.1').release()
+
+    decision = service.admit('10.0.0.1')
+    assert not decision.admitted
+    assert decision.status == 429
+    assert decision.retry_after == 1
+
+    # Other clients have their own bucket
+    assert service.admit('10.0.0.2').admitted
+
+
+def test_overload_returns_503_with_retry_after(clock):
+    service = AdmissionControlService(max_inflight_cost=10)
+    first = service.admit('a', cost=8)
+    assert first.admitted
+
+    decision = service.admit('b', cost=5)
+    assert not decision.admitted
+    assert decision.status == 503
+    assert decision.retry_after == 3
+
+    first.release()
+    assert service.admit('b', cost=5).admitted
+
+
+def test_shed_requests_do_not_spend_client_quota(clock):
+    service = AdmissionControlService(max_inflight_cost=10, client_burst=1)
+    busy = service.admit('a', cost=10)
+
+    assert service.admit('b', cost=5).status == 503
+    busy.release()
+    assert service.admit('b', cost=5).admitted
+
+
+def test_lone_oversized_request_is_admitted(clock):
+    service = AdmissionControlService(max_inflight_cost=10)
+    assert service.admit('a', cost=60).admitted
+
+
+def test_degraded_above_load_factor(clock):
+    service = AdmissionControlService(max_inflight_cost=10, degrade_load_factor=0.5)
+    assert not service.admit('a', cost=4).degraded
+    assert service.admit('b', cost=4).degraded
+
+
+def test_release_is_idempotent(clock):
+    service = AdmissionControlService(max_inflight_cost=10)
+    decision = service.admit('a', cost=4)
+    decision.release()
+    decision.release()
+    assert service.get_stats()['inflight_cost'] == 0
+    assert service.get_stats()['inflight_requests'] == 0
+
+
+def test_estimate_audio_cost_from_wav_header():
+    service = AdmissionControlService()
+    assert service.estimate_audio_cost(wav_base64(3)) == pytest.approx(3.0, abs=0.01)
+
+
+def test_estimate_audio_cost_for_compressed_audio_uses_size():
+    service = AdmissionControlService()
+    payload = base64.b64encode(b'\x1a\x45\xdf\xa3' + b'\0' * 39996).decode('ascii')
+    assert service.estimate_audio_cost(payload) == pytest.approx(10.0, abs=0.01)
@@ -0,0 +1,106 @@
+import sqlite3
+
+import pytest
+
+from app import create_app
+from services.session_service import SessionService
+
+
+class EchoVoiceAssistant:
+    """Stand-in that records the session context it was given"""
+
+    def __init__(self):
+        self.contexts = []
+
+    def process_voice_query(self, audio_base64, skip_audio=False, deadline=None, context=None):
+        self.contexts.append(context)
+        if context is not None:
+            context.update({'crop': 'tomato', 'topic': 'planting'})
+        return {'success': True, 'original_zulu': '', 'english_translation': '', 'audio_response_url': None}
+
+
+@pytest.fixture
+def assistant():
+    return EchoVoiceAssistant()
+
+
+@pytest.fixture
+def client(assistant, monkeypatch):
+    monkeypatch.delenv('SESSION_DB_PATH', raising=False)
+    return create_app(voice_assistant=assistant).test_client()
+
+
+def voice_query(client, **kwargs):
+    return client.post('/voice-query', json={'audio': 'UklGRg==', **kwargs.pop('json', {})}, **kwargs)
+
+
+def inflight(client):
+    return client.get('/test-voice').get_json()['load']['inflight_requests']
+
+
+def test_session_header_carries_context_between_turns(client, assistant):
+    first = voice_query(client, headers={'X-Session-Id': 'abc'})
+    assert first.status_code == 200
+    assert first.get_json()['session'] == {'crop': 'tomato', 'topic': 'planting', 'turns': 1}
+
+    voice_query(client, headers={'X-Session-Id': 'abc'})
+    assert assistant.contexts[-1].crop == 'tomato'
+
+
+@pytest.mark.parametrize('session_id', [42, ['abc'], {'id': 'abc'}])
+def test_non_string_session_id_is_ignored(client, assistant, session_id):
+    response = voice_query(client, json={'session_id': session_id})
+    assert response.status_code == 200
+    assert 'session' not in response.get_json()
+    assert assistant.contexts == [None]
+
+
+def test_session_store_errors_do_not_fail_or_leak_admission(client, assistant, monkeypatch):
+    def locked(*args, **kwargs):
+        raise sqlite3.OperationalError('database is locked')
+
+    monkeypatch.setattr(SessionService, 'get', locked)
+    response = voice_query(client, headers={'X-Session-Id': 'abc'})
+    assert response.status_code == 200
+    assert assistant.contexts == [None]
+    assert inflight(client) == 0
+
+    monkeypatch.undo()
+    monkeypatch.setattr(SessionService, 'save', locked)
+    response = voice_query(client, headers={'X-Session-Id': 'abc'})
+    assert response.status_code == 200
+    assert 'session' not in response.get_json()
+    assert inflight(client) == 0
+
+
+def test_pipeline_error_releases_admission(client, assistant, monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError('boom')
+
+    monkeypatch.setattr(assistant, 'process_voice_query', broken)
+    assert voice_query(client).status_code == 500
+    assert inflight(client) == 0
+
+
+def test_request_log_needs_a_real_key(assistant, tmp_path, monkeypatch):
+    log_path = tmp_path / 'requests.log'
+    monkeypatch.setenv('REQUEST_LOG_PATH', str(log_path))
+    monkeypatch.delenv('REQUEST_LOG_KEY', raising=False)
+    monkeypatch.delenv('SECRET_KEY', raising=False)
+    client = create_app(voice_assistant=assistant).test_client()
+    assert client.get('/test-voice').get_json()['request_log'] is None
+
+    monkeypatch.setenv('REQUEST_LOG_KEY', 'a-real-secret')
+    client = create_app(voice_assistant=assistant).test_client()
+    assert client.get('/test-voice').get_json()['request_log']['path'] == str(log_path)
+
+
+def test_forwarded_client_ids_are_rate_limited_separately(assistant, monkeypatch):
+    # Replay relies on the trusted X-Forwarded-For hop to keep recorded clients apart
+    monkeypatch.setenv('CLIENT_BURST', '1')
+    monkeypatch.setenv('CLIENT_RATE_PER_MINUTE', '1')
+    client = create_app(voice_assistant=assistant).test_client()
+
+    assert voice_query(client, headers={'X-Forwarded-For': 'client-a'}).status_code == 200
+    assert voice_query(client, headers={'X-Forwarded-For': 'client-b'}).status_code == 200
+    assert voice_query(client, headers={'X-Forwarded-For': 'client-a'}).status_code == 429
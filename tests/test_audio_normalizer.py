@@ -0,0 +1,121 @@
+import io
+import struct
+import wave
+
+import numpy as np
+import pytest
+
+from services.audio_normalizer import AudioNormalizer
+
+
+def make_wav(frames, sample_rate=16000, channels=1, sample_width=2):
+    """WAV bytes from raw little-endian frame data"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(sample_width)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(frames)
+    return buffer.getvalue()
+
+
+def int16_frames(values):
+    return np.asarray(values, dtype='<i2').tobytes()
+
+
+@pytest.fixture
+def normalizer():
+    return AudioNormalizer()
+
+
+@pytest.mark.parametrize('header, expected', [
+    (b'RIFF\0\0\0\0WAVEfmt ', 'wav'),
+    (b'\x1a\x45\xdf\xa3\0\0\0\0', 'webm'),
+    (b'OggS\0\0\0\0', 'ogg'),
+    (b'fLaC\0\0\0\0', 'flac'),
+    (b'\0\0\0\x20ftypisom', 'mp4'),
+    (b'ID3\x03\0\0\0\0', 'mp3'),
+    (b'\xff\xfb\x90\x00', 'mp3'),
+    (b'RIFF\0\0\0\0AVI ', 'unknown'),
+    (b'', 'unknown'),
+])
+def test_probe_format(normalizer, header, expected):
+    assert normalizer.probe_format(header) == expected
+
+
+def test_16khz_mono_passes_through(normalizer):
+    values = [0, 1000, -1000, 32767, -32768]
+    samples = normalizer.normalize(make_wav(int16_frames(values)))
+
+    assert samples.dtype == np.int16
+    assert len(samples) == len(values)
+    # Round-tripping through float scaling may move a sample by one step
+    assert np.abs(samples.astype(int) - values).max() <= 1
+
+
+@pytest.mark.parametrize('source_rate', [8000, 22050, 44100, 48000])
+def test_resamples_to_16khz(normalizer, source_rate):
+    seconds = 0.5
+    frames = int(seconds * source_rate)
+    samples = normalizer.normalize(make_wav(int16_frames(np.zeros(frames)), sample_rate=source_rate))
+
+    assert len(samples) == pytest.approx(seconds * 16000, abs=1)
+    assert normalizer.duration_seconds(samples) == pytest.approx(seconds, abs=0.001)
+
+
+def test_stereo_is_averaged_to_mono(normalizer):
+    # Left +16000, right -8000 -> mono +4000
+    stereo = int16_frames([16000, -8000] * 100)
+    samples = normalizer.normalize(make_wav(stereo, channels=2))
+
+    assert len(samples) == 100
+    assert np.abs(samples.astype(int) - 4000).max() <= 1
+
+
+def test_odd_length_multichannel_drops_partial_frame(normalizer):
+    # Three whole stereo frames plus one orphan left-channel sample
+    frames = int16_frames([1000, 3000] * 3 + [32000])
+    samples, sample_rate = normalizer._decode_wav(make_wav(frames, channels=2))
+
+    assert sample_rate == 16000
+    assert samples.tolist() == pytest.approx([2000 / 32768.0] * 3)
+
+
+def test_8bit_unsigned_is_centred(normalizer):
+    frames = bytes([0, 128, 255])
+    samples, _ = normalizer._decode_wav(make_wav(frames, sample_width=1))
+    assert samples.tolist() == pytest.approx([-1.0, 0.0, 127 / 128])
+
+
+def test_24bit_is_sign_extended(normalizer):
+    values = [0, 1, -1, 0x7FFFFF, -0x800000]
+    frames = b''.join(struct.pack('<i', value)[:3] for value in values)
+    samples, _ = normalizer._decode_wav(make_wav(frames, sample_width=3))
+    assert samples.tolist() == pytest.approx([value / 8388608.0 for value in values])
+
+
+def test_32bit_is_scaled(normalizer):
+    frames = np.asarray([0, 2 ** 30, -2 ** 31], dtype='<i4').tobytes()
+    samples, _ = normalizer._decode_wav(make_wav(frames, sample_width=4))
+    assert samples.tolist() == pytest.approx([0.0, 0.5, -1.0])
+
+
+def test_int16_conversion_clips_overshoot(normalizer):
+    # Resampling can ring past full scale; it must clip, not wrap around
+    samples = normalizer._to_int16(np.array([1.5, -1.5, 0.5], dtype=np.float32))
+    assert samples.tolist() == [32767, -32767, 16383]
+
+
+def test_linear16_and_float32_views(normalizer):
+    samples = np.array([0, 16384, -32768], dtype=np.int16)
+    assert normalizer.to_linear16(samples) == struct.pack('<3h', 0, 16384, -32768)
+
+    floats = normalizer.to_float32(samples)
+    assert floats.dtype == np.float32
+    assert floats.tolist() == [0.0, 0.5, -1.0]
+
+
+def test_non_wav_without_ffmpeg_raises(normalizer):
+    normalizer.ffmpeg_path = None
+    with pytest.raises(RuntimeError):
+        normalizer.normalize(b'\x1a\x45\xdf\xa3' + b'\0' * 32)
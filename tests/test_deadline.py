@@ -0,0 +1,105 @@
+import threading
+
+import pytest
+
+from services.deadline import Deadline, DeadlineExceeded, WorkerPool, WorkerUnavailable, get_deadline_stats
+
+
+def counts(kind, stage):
+    return get_deadline_stats()[kind].get(stage, 0)
+
+
+@pytest.fixture
+def pool():
+    return WorkerPool('test', 1)
+
+
+def test_run_returns_result_within_budget(pool):
+    assert Deadline(5).run('translation', lambda x: x * 2, 21, pool=pool) == 42
+
+
+def test_timeout_counts_a_miss_for_the_stage(pool):
+    release = threading.Event()
+    misses = counts('misses', 'transcription')
+
+    with pytest.raises(DeadlineExceeded) as excinfo:
+        Deadline(0.05).run('transcription', release.wait, pool=pool)
+
+    assert excinfo.value.stage == 'transcription'
+    assert counts('misses', 'transcription') == misses + 1
+    release.set()
+
+
+def test_expired_deadline_does_not_submit(pool):
+    calls = []
+    deadline = Deadline(0)
+
+    with pytest.raises(DeadlineExceeded):
+        deadline.run('translation', calls.append, 1, pool=pool)
+    assert calls == []
+    assert pool.busy() == 0
+
+
+def test_abandoned_work_keeps_its_worker_until_it_finishes(pool):
+    release = threading.Event()
+    settled = threading.Event()
+    deadline = Deadline(0.05)
+    with pytest.raises(DeadlineExceeded):
+        deadline.run('transcription', release.wait, pool=pool)
+
+    assert not pool.has_capacity()
+    saturated = counts('saturated', 'transcription')
+    misses = counts('misses', 'transcription')
+
+    # A busy pool refuses immediately instead of queueing and timing out
+    with pytest.raises(WorkerUnavailable):
+        Deadline(5).run('transcription', lambda: None, pool=pool)
+    assert counts('saturated', 'transcription') == saturated + 1
+    assert counts('misses', 'transcription') == misses
+
+    release.set()
+    deadline.on_settled(settled.set)
+    assert settled.wait(1)
+    assert Deadline(5).run('transcription', lambda: 'ok', pool=pool) == 'ok'
+
+
+def test_stuck_transcription_does_not_delay_other_pools():
+    transcription = WorkerPool('test-transcription', 1)
+    network = WorkerPool('test-network', 1)
+    release = threading.Event()
+    with pytest.raises(DeadlineExceeded):
+        Deadline(0.05).run('transcription', release.wait, pool=transcription)
+
+    misses = counts('misses', 'translation')
+    assert Deadline(1).run('translation', str.upper, 'sawubona', pool=network) == 'SAWUBONA'
+    assert counts('misses', 'translation') == misses
+    release.set()
+
+
+def test_on_settled_waits_for_abandoned_work(pool):
+    release = threading.Event()
+    settled = threading.Event()
+    deadline = Deadline(0.05)
+    with pytest.raises(DeadlineExceeded):
+        deadline.run('transcription', release.wait, pool=pool)
+
+    deadline.on_settled(settled.set)
+    assert not settled.is_set()
+
+    release.set()
+    assert settled.wait(1)
+
+
+def test_on_settled_runs_immediately_without_abandoned_work(pool):
+    settled = []
+    deadline = Deadline(5)
+    deadline.run('translation', lambda: None, pool=pool)
+    deadline.on_settled(lambda: settled.append(True))
+    assert settled == [True]
+
+
+def test_allows_records_fallback_when_budget_is_short():
+    fallbacks = counts('fallbacks', 'tts')
+    assert not Deadline(0.5).allows('tts')
+    assert counts('fallbacks', 'tts') == fallbacks + 1
+    assert Deadline(5).allows('tts')
@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from services import farming_advice_service
+from services.farming_advice_service import FarmingAdviceService
+from services.knowledge_base import load_knowledge_base
+from services.session_service import SessionContext
+
+ENTRIES = [
+    {'keyword': 'plant', 'category': 'planting', 'en': 'Plant in spring.'},
+    {'keyword': 'tomato', 'category': 'planting', 'en': 'Tomatoes like warm soil.'},
+    {'keyword': 'maize', 'category': 'planting', 'en': 'Maize needs regular watering.'},
+    {'keyword': 'water', 'category': 'watering', 'en': 'Water deeply in the morning.'},
+    {'keyword': 'pest', 'category': 'pests', 'en': 'Check leaves for pests weekly.'},
+]
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    source = tmp_path / 'knowledge_base.json'
+    source.write_text(json.dumps({'version': 1, 'entries': ENTRIES}))
+    kb_path = str(tmp_path / 'knowledge_base.kb')
+    load_knowledge_base(kb_path, str(source))
+    monkeypatch.setattr(farming_advice_service, 'current_season', lambda today=None: 'summer')
+    return FarmingAdviceService(kb_path=kb_path)
+
+
+@pytest.fixture
+def tomato_context(service):
+    context = SessionContext()
+    context.update(service.extract_entities('When should I plant tomatoes?'))
+    return context
+
+
+def test_extract_entities(service):
+    assert service.extract_entities('When should I plant tomatoes?') == {'crop': 'tomato', 'topic': 'planting'}
+    assert service.extract_entities('And how much water?') == {'crop': None, 'topic': 'watering'}
+    assert service.extract_entities('Hello') == {'crop': None, 'topic': None}
+
+
+def test_follow_up_topic_is_answered_for_the_earlier_crop(service, tomato_context):
+    assert service.get_advice('And how much water?', tomato_context) == \
+        'For your tomato: Water deeply in the morning.'
+
+
+def test_follow_up_without_topic_returns_crop_advice(service, tomato_context):
+    assert service.get_advice('What else?', tomato_context) == 'Tomatoes like warm soil.'
+
+
+def test_follow_up_planting_question_returns_crop_advice(service, tomato_context):
+    assert service.get_advice('When do I plant?', tomato_context) == 'Tomatoes like warm soil.'
+
+
+def test_naming_a_new_crop_ignores_the_session(service, tomato_context):
+    assert service.get_advice('How do I grow maize?', tomato_context) == 'Maize needs regular watering.'
+
+
+def test_context_carries_the_crop_across_turns(service, tomato_context):
+    tomato_context.update(service.extract_entities('And how much water?'))
+    assert (tomato_context.crop, tomato_context.topic, tomato_context.turns) == ('tomato', 'watering', 2)
+
+    assert service.get_advice('Any pests to watch for?', tomato_context) == \
+        'For your tomato: Check leaves for pests weekly.'
+
+
+def test_without_context_follow_up_gets_generic_advice(service):
+    assert service.get_advice('And how much water?') == 'Water deeply in the morning.'
+    assert service.get_advice('What else?').startswith('General farming advice')
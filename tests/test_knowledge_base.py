@@ -0,0 +1,117 @@
+import json
+import os
+
+import pytest
+
+from services.knowledge_base import KnowledgeBase, compile_knowledge_base, load_knowledge_base
+
+ENTRIES = [
+    {'keyword': 'plant', 'category': 'planting', 'en': 'Plant in spring.', 'zu': 'Tshala entwasahlobo.'},
+    {'keyword': 'Tomato', 'category': 'planting', 'en': 'Tomatoes like warm soil.'},
+    {'keyword': 'disease', 'category': 'pests', 'en': 'Remove diseased leaves.'},
+    {'keyword': 'frost', 'category': 'weather', 'en': 'Cover plants on cold nights.'},
+    {'keyword': 'frost', 'category': 'weather', 'season': 'winter', 'en': 'Frost is likely tonight.'},
+    {'keyword': 'frost', 'category': 'weather', 'region': 'Highveld', 'season': 'winter',
+     'en': 'Highveld frosts are hard; use frost cloth.'},
+    {'keyword': 'ukuvuna', 'category': 'harvest', 'en': 'Harvest in the morning.'},
+    {'keyword': 'disease', 'category': 'pests', 'en': 'Rotate crops to break disease cycles.'},
+]
+
+
+def write_source(path, entries, version=1):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'version': version, 'entries': entries}, f)
+
+
+@pytest.fixture
+def kb_paths(tmp_path):
+    source = str(tmp_path / 'knowledge_base.json')
+    output = str(tmp_path / 'knowledge_base.kb')
+    write_source(source, ENTRIES)
+    compile_knowledge_base(source, output)
+    return source, output
+
+
+def test_compile_round_trips_every_field(kb_paths):
+    _, output = kb_paths
+    knowledge_base = KnowledgeBase(output)
+
+    # The later "disease" duplicate replaces the text in place
+    assert len(knowledge_base) == 7
+    assert knowledge_base.data_version == 1
+    entries = {(entry['keyword'], entry['region'], entry['season']): entry for entry in knowledge_base.entries()}
+    assert entries[('plant', '', '')]['zu'] == 'Tshala entwasahlobo.'
+    assert entries[('tomato', '', '')]['en'] == 'Tomatoes like warm soil.'
+    assert entries[('tomato', '', '')]['zu'] == ''
+    assert entries[('disease', '', '')]['en'] == 'Rotate crops to break disease cycles.'
+    assert entries[('frost', 'highveld', 'winter')]['category'] == 'weather'
+
+
+def test_match_prefers_earliest_keyword_in_priority_order(kb_paths):
+    _, output = kb_paths
+    knowledge_base = KnowledgeBase(output)
+
+    assert knowledge_base.match('My plants have a disease')['keyword'] == 'plant'
+    assert knowledge_base.match('Is this a DISEASE?')['keyword'] == 'disease'
+    assert knowledge_base.match('Transplanting tomatoes')['keyword'] == 'plant'
+    assert knowledge_base.match('Ngifuna ukuvuna')['category'] == 'harvest'
+    assert knowledge_base.match('How is the weather?') is None
+
+
+def test_duplicate_keeps_first_position(kb_paths):
+    _, output = kb_paths
+    knowledge_base = KnowledgeBase(output)
+    keywords = [entry['keyword'] for entry in knowledge_base.entries()]
+    assert keywords.index('disease') < keywords.index('frost')
+
+
+def test_region_and_season_variants(kb_paths):
+    _, output = kb_paths
+    knowledge_base = KnowledgeBase(output)
+
+    assert knowledge_base.match('frost tonight')['en'] == 'Cover plants on cold nights.'
+    assert knowledge_base.match('frost tonight', season='winter')['en'] == 'Frost is likely tonight.'
+    assert knowledge_base.match('frost tonight', region='highveld', season='winter')['en'] == \
+        'Highveld frosts are hard; use frost cloth.'
+    assert knowledge_base.match('frost tonight', region='highveld', season='summer')['en'] == \
+        'Cover plants on cold nights.'
+    assert knowledge_base.get('frost', season='winter') == 'Frost is likely tonight.'
+    assert knowledge_base.get('hail', 'none') == 'none'
+
+
+def test_reload_picks_up_rebuilt_file(kb_paths):
+    source, output = kb_paths
+    knowledge_base = KnowledgeBase(output, reload_interval=0)
+    assert knowledge_base.match('plant')['en'] == 'Plant in spring.'
+
+    write_source(source, [{'keyword': 'plant', 'category': 'planting', 'en': 'Plant after the rains.'}], version=2)
+    compile_knowledge_base(source, output)
+
+    assert knowledge_base.match('plant')['en'] == 'Plant after the rains.'
+    assert knowledge_base.data_version == 2
+    assert len(knowledge_base) == 1
+
+
+def test_entry_handle_survives_reload(kb_paths):
+    source, output = kb_paths
+    knowledge_base = KnowledgeBase(output, reload_interval=0)
+    entry = knowledge_base.match('a frost warning')
+
+    # The rebuilt file is much shorter, so the old index would be out of range
+    write_source(source, [{'keyword': 'plant', 'category': 'planting', 'en': 'Plant after the rains.'}], version=2)
+    compile_knowledge_base(source, output)
+    assert knowledge_base.reload_if_changed()
+
+    assert entry['keyword'] == 'frost'
+    assert entry['en'] == 'Cover plants on cold nights.'
+
+
+def test_load_compiles_missing_file(tmp_path):
+    source = str(tmp_path / 'source.json')
+    output = str(tmp_path / 'compiled.kb')
+    write_source(source, ENTRIES)
+
+    knowledge_base = load_knowledge_base(output, source)
+    assert os.path.exists(output)
+    assert load_knowledge_base(output, source) is knowledge_base
+    assert knowledge_base.match('tomato')['keyword'] == 'tomato'
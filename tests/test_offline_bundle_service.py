@@ -0,0 +1,49 @@
+import json
+import os
+import shutil
+
+from services import offline_bundle_service
+from services.offline_bundle_service import OFFLINE_PHRASES, OfflineBundleService
+
+
+def load_knowledge(bundle, manifest):
+    with open(os.path.join(bundle.version_dir(manifest['version']), 'knowledge.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_phrases_point_at_exported_keywords(tmp_path):
+    bundle = OfflineBundleService(bundle_root=str(tmp_path))
+    knowledge = load_knowledge(bundle, bundle.build(translate=False, render_audio=False))
+
+    entries = {entry['keyword']: entry for entry in knowledge['entries']}
+    for phrase, target in knowledge['phrases'].items():
+        assert target['keyword'] is None or target['keyword'] in entries, phrase
+    assert knowledge['phrases'] == OFFLINE_PHRASES
+    assert OFFLINE_PHRASES['izitshalo zami zinezifo']['keyword'] == 'disease'
+
+    # A general weather question gets general weather advice, not frost protection
+    weather = entries[OFFLINE_PHRASES['isimo sezulu sithini']['keyword']]
+    assert weather['keyword'] == 'weather'
+    assert weather['category'] == 'weather'
+
+
+def test_concurrent_build_of_same_version_succeeds(tmp_path, monkeypatch):
+    bundle = OfflineBundleService(bundle_root=str(tmp_path))
+    first = bundle.build(translate=False, render_audio=False)
+    published = bundle.version_dir(first['version'])
+    saved = str(tmp_path / 'saved')
+    shutil.move(published, saved)
+
+    real_rename = os.rename
+
+    def rename_after_other_worker(source, target):
+        # Another process publishes the same version between our exists() check and rename()
+        shutil.copytree(saved, target)
+        real_rename(source, target)
+
+    monkeypatch.setattr(offline_bundle_service.os, 'rename', rename_after_other_worker)
+    second = bundle.build(translate=False, render_audio=False)
+
+    assert second['version'] == first['version']
+    assert os.path.isfile(os.path.join(published, 'knowledge.json'))
+    assert not [name for name in os.listdir(tmp_path) if name.startswith('.build-')]
@@ -0,0 +1,54 @@
+import sys
+import threading
+import time
+
+from services.deadline import Deadline, WorkerPool
+from services.profiling_service import ProfilingService
+
+
+def spin(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def other_requests_work(release):
+    release.wait()
+
+
+def test_profile_samples_only_this_requests_pipeline_work():
+    profiler = ProfilingService(enabled=True, sample_every_n=1, sample_interval=0.001)
+    pool = WorkerPool('test-profile', 3)
+    release = threading.Event()
+    # Work submitted for another request shares the pool but must not be sampled
+    pool.submit(other_requests_work, release)
+
+    profile = profiler.start('voice_query')
+    Deadline(5, profile=profile).run('translation', spin, 0.1, pool=pool)
+    time.sleep(0.02)
+    profile.stop()
+    release.set()
+
+    stacks = profiler.get_cpu_profiles('voice_query')['voice_query']['stacks']
+    assert any(entry['stack'].endswith('test_profiling_service.py:spin') for entry in stacks)
+    assert not any('other_requests_work' in entry['stack'] for entry in stacks)
+    # Idle pool workers are filtered out
+    assert not any(entry['stack'].endswith('thread.py:_worker') for entry in stacks)
+    assert profile.thread_ids == {profile.thread_id}
+
+
+def test_every_nth_request_is_profiled():
+    profiler = ProfilingService(enabled=True, sample_every_n=3, sample_interval=0.001)
+    profiles = [profiler.start('voice_query') for _ in range(6)]
+    assert [profile is not None for profile in profiles] == [False, False, True, False, False, True]
+    for profile in profiles:
+        if profile is not None:
+            profile.stop()
+
+
+def test_process_stats_without_resource_module(monkeypatch):
+    # Windows has no resource module; stats must still be served
+    monkeypatch.setitem(sys.modules, 'resource', None)
+    stats = ProfilingService().get_process_stats()
+    assert 'max_rss_kb' not in stats
+    assert stats['pid'] > 0
@@ -0,0 +1,27 @@
+import hashlib
+import json
+import time
+
+from services.request_recorder_service import RequestRecorderService, hash_value
+
+
+def test_hash_value_is_keyed():
+    assert hash_value('203.0.113.7', 'key-a') == hash_value('203.0.113.7', b'key-a')
+    assert hash_value('203.0.113.7', 'key-a') != hash_value('203.0.113.7', 'key-b')
+    # An unkeyed digest of the address must not appear in the log
+    assert hash_value('203.0.113.7', 'key-a') != hashlib.sha256(b'203.0.113.7').hexdigest()[:16]
+    assert hash_value(None, 'key-a') is None
+
+
+def test_recorder_keeps_arrival_time(tmp_path):
+    path = tmp_path / 'requests.log'
+    recorder = RequestRecorderService(str(path), 'secret', flush_interval=0.01)
+    recorder.record({'endpoint': 'voice_query', 'ts': 123.5, 'client': recorder.hash('203.0.113.7')})
+
+    deadline = time.monotonic() + 2
+    while recorder.recorded < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    entry = json.loads(path.read_text().strip())
+    assert entry['ts'] == 123.5
+    assert entry['client'] == hash_value('203.0.113.7', 'secret')
@@ -0,0 +1,96 @@
+import pytest
+
+from services import session_service
+from services.session_service import MemorySessionBackend, SessionContext, SessionService, SqliteSessionBackend
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(session_service.time, 'time', fake)
+    return fake
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def backend(request, tmp_path):
+    if request.param == 'memory':
+        return MemorySessionBackend()
+    return SqliteSessionBackend(str(tmp_path / 'sessions.db'))
+
+
+def test_context_round_trips_through_backend(backend, clock):
+    sessions = SessionService(backend)
+    context = sessions.get('abc')
+    context.update({'crop': 'tomato', 'topic': 'planting'})
+    sessions.save('abc', context)
+
+    loaded = sessions.get('abc')
+    assert loaded.to_dict() == {'crop': 'tomato', 'topic': 'planting', 'turns': 1}
+    assert len(backend) == 1
+
+
+def test_expired_session_starts_fresh(backend, clock):
+    sessions = SessionService(backend, ttl_seconds=60)
+    context = sessions.get('abc')
+    context.update({'crop': 'maize'})
+    sessions.save('abc', context)
+
+    clock.now += 61
+    assert sessions.get('abc').to_dict() == {'crop': None, 'topic': None, 'turns': 0}
+    assert len(backend) == 0
+
+
+def test_sweep_removes_abandoned_sessions(backend, clock):
+    sessions = SessionService(backend, ttl_seconds=60, sweep_interval=30)
+    for session_id in ('old-1', 'old-2'):
+        sessions.save(session_id, SessionContext())
+
+    clock.now += 61
+    sessions.save('new', SessionContext())
+
+    assert len(backend) == 1
+    assert backend.get('new') is not None
+    assert sessions.get_stats()['expired_swept'] == 2
+
+
+def test_invalid_session_ids_are_ignored(backend, clock):
+    sessions = SessionService(backend)
+    for session_id in (None, '', 42, ['abc'], {'id': 'abc'}, 'x' * 129):
+        assert sessions.get(session_id) is None
+        sessions.save(session_id, SessionContext())
+    assert len(backend) == 0
+
+
+def test_memory_backend_evicts_least_recently_used(clock):
+    backend = MemorySessionBackend(max_sessions=2)
+    backend.set('a', SessionContext().to_tuple())
+    backend.set('b', SessionContext().to_tuple())
+    backend.get('a')
+    backend.set('c', SessionContext().to_tuple())
+
+    assert backend.get('b') is None
+    assert backend.get('a') is not None
+    assert backend.get('c') is not None
+
+
+def test_sqlite_backend_is_shared_between_instances(tmp_path, clock):
+    path = str(tmp_path / 'sessions.db')
+    first = SessionService(SqliteSessionBackend(path))
+    second = SessionService(SqliteSessionBackend(path))
+
+    context = first.get('abc')
+    context.update({'crop': 'beans'})
+    first.save('abc', context)
+    context.update({'topic': 'pests'})
+    first.save('abc', context)
+
+    assert second.get('abc').to_dict() == {'crop': 'beans', 'topic': 'pests', 'turns': 2}
+    assert len(second.backend) == 1
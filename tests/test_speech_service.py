@@ -0,0 +1,77 @@
+import io
+import wave
+
+import pytest
+
+from services.audio_normalizer import AudioNormalizer
+from services.speech_service import SpeechToTextService, speech
+
+
+class FakeSpeechClient:
+    """Records recognize calls and returns no transcript"""
+
+    def __init__(self):
+        self.calls = []
+
+    def recognize(self, config, audio, timeout=None):
+        self.calls.append((config, audio))
+        return speech.RecognizeResponse()
+
+
+@pytest.fixture
+def service():
+    # Skip __init__, which points the Google client at credentials on disk
+    service = SpeechToTextService.__new__(SpeechToTextService)
+    service.normalizer = AudioNormalizer()
+    service.mock_mode = False
+    service.client = FakeSpeechClient()
+    return service
+
+
+def write_wav(path, seconds, sample_rate=48000, channels=2):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(b'\0' * int(seconds * sample_rate) * channels * 2)
+    path.write_bytes(buffer.getvalue())
+    return len(buffer.getvalue())
+
+
+def test_linear16_config_matches_normalizer_output(service):
+    config = service._linear16_config('zu-ZA')
+    assert config.encoding == speech.RecognitionConfig.AudioEncoding.LINEAR16
+    assert config.sample_rate_hertz == 16000
+    assert config.audio_channel_count == 1
+    assert config.language_code == 'zu-ZA'
+
+
+def test_upload_is_sent_as_normalized_linear16(service, tmp_path):
+    path = tmp_path / 'upload.wav'
+    write_wav(path, 0.25)
+
+    service.transcribe_audio(str(path))
+
+    config, audio = service.client.calls[-1]
+    assert config.sample_rate_hertz == 16000
+    # 0.25 s of 16 kHz mono int16, no WAV header
+    assert len(audio.content) == 0.25 * 16000 * 2
+
+
+def test_small_upload_check_uses_uploaded_size(service, tmp_path, capsys):
+    # 48 kHz stereo upload over 50 KB that normalizes to well under 50 KB of PCM
+    path = tmp_path / 'upload.wav'
+    size = write_wav(path, 0.3)
+    assert size > 50000
+
+    assert service.transcribe_audio(str(path)) == ''
+    assert 'too small' not in capsys.readouterr().out
+
+
+def test_tiny_upload_is_reported_as_too_small(service, tmp_path, capsys):
+    path = tmp_path / 'upload.wav'
+    write_wav(path, 0.05)
+
+    assert service.transcribe_audio(str(path)) == ''
+    assert 'too small' in capsys.readouterr().out